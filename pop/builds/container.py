@@ -3,66 +3,23 @@ Container build template management for Ubuntu Pro on Premises (PoP)
 """
 
 import os
+import functools
 import logging
-import shutil
+import string
 import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
+from pop.builds.common import materialize_apt_tree, walk_relative, write_files, write_meta
 
-def create_container_template(builds_dir: str, paths: Dict[str, str], 
-                            release: str, architectures: List[str]) -> Dict[str, Any]:
-    """
-    Create container build templates
-    
-    Args:
-        builds_dir: Directory to store build files
-        paths: Dictionary of system paths
-        release: Ubuntu release codename (e.g., 'jammy')
-        architectures: List of architectures to support
-        
-    Returns:
-        Dictionary with build information
-    """
-    logging.info("Creating container build templates")
-    
-    container_dir = os.path.join(builds_dir, "container")
-    os.makedirs(container_dir, exist_ok=True)
-    
-    # Files to copy from the repository
-    files = [
-        {"src": paths["pop_apt_mirror_list"], "dst": "etc/apt/sources.list.d/pop.list"},
-        {"src": paths["pop_apt_auth_file"], "dst": "etc/apt/auth.conf.d/91ubuntu-pro"},
-        {"src": paths["pop_gpg_dir"], "dst": "etc/apt/trusted.gpg.d/"},
-    ]
-    
-    # Create subdirectories for file structure
-    for file_info in files:
-        dst_path = os.path.join(container_dir, file_info["dst"])
-        dst_dir = os.path.dirname(dst_path)
-        os.makedirs(dst_dir, exist_ok=True)
-    
-    # Copy files
-    for file_info in files:
-        src_path = file_info["src"]
-        dst_path = os.path.join(container_dir, file_info["dst"])
-        
-        if os.path.isdir(src_path):
-            if os.path.exists(dst_path):
-                shutil.rmtree(dst_path)
-            shutil.copytree(src_path, dst_path)
-        else:
-            shutil.copy2(src_path, dst_path)
-            
-        logging.debug(f"Copied {src_path} to {dst_path}")
-    
-    # Create Dockerfile template
-    dockerfile_path = os.path.join(container_dir, "Dockerfile")
-    with open(dockerfile_path, 'w') as f:
-        f.write(f"""# Dockerfile for Ubuntu Pro container with PoP integration
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()}
+# Architectures with official Ubuntu container base images
+_SUPPORTED_CONTAINER_ARCHS = frozenset({"amd64", "arm64", "ppc64el", "s390x"})
 
-FROM ubuntu:{release}
+# Template bodies are compiled once at import time; substitution is a
+# single C-level scan instead of re-building the literal per call
+_DOCKERFILE_TPL = string.Template("""# Dockerfile for Ubuntu Pro container with PoP integration
+# For Ubuntu ${release_cap}
+
+FROM ubuntu:${release}
 
 # Add PoP repository files
 COPY etc/apt/sources.list.d/pop.list /etc/apt/sources.list.d/
@@ -80,51 +37,37 @@ RUN apt-get update && \\
 # Runtime configuration
 CMD ["/bin/bash"]
 """)
-    
-    # Create docker-compose.yml template
-    compose_path = os.path.join(container_dir, "docker-compose.yml")
-    with open(compose_path, 'w') as f:
-        f.write(f"""# Docker Compose for Ubuntu Pro container with PoP integration
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()}
+
+_COMPOSE_TPL = string.Template("""# Docker Compose for Ubuntu Pro container with PoP integration
+# For Ubuntu ${release_cap}
 
 version: '3'
 
 services:
   app:
     build: .
-    container_name: pop-{release}
+    container_name: pop-${release}
     volumes:
       - ./data:/data
     environment:
       - TZ=UTC
     restart: unless-stopped
 """)
-    
-    # Create build script
-    build_script_path = os.path.join(container_dir, "build.sh")
-    with open(build_script_path, 'w') as f:
-        f.write(f"""#!/bin/bash
+
+_BUILD_SH_TPL = string.Template("""#!/bin/bash
 # Build script for Ubuntu Pro container
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()}
+# For Ubuntu ${release_cap}
 
 set -e
 
 # Build the container image
-docker build -t pop-ubuntu:{release} .
+docker build -t pop-ubuntu:${release} .
 
-echo "Container image built successfully: pop-ubuntu:{release}"
-echo "To run the container: docker run -it pop-ubuntu:{release}"
+echo "Container image built successfully: pop-ubuntu:${release}"
+echo "To run the container: docker run -it pop-ubuntu:${release}"
 """)
-    
-    # Make the build script executable
-    os.chmod(build_script_path, 0o755)
-    
-    # Create README.md with instructions
-    readme_path = os.path.join(container_dir, "README.md")
-    with open(readme_path, 'w') as f:
-        f.write(f"""# PoP Container Build Files
+
+_README_TPL = string.Template("""# PoP Container Build Files
 
 This directory contains files needed to build a container with Ubuntu Pro on Premises (PoP) integration.
 
@@ -146,11 +89,11 @@ This directory contains files needed to build a container with Ubuntu Pro on Pre
    ```
 3. Or build manually:
    ```bash
-   docker build -t pop-ubuntu:{release} .
+   docker build -t pop-ubuntu:${release} .
    ```
 4. Run the container:
    ```bash
-   docker run -it pop-ubuntu:{release}
+   docker run -it pop-ubuntu:${release}
    ```
 
 ## Customization
@@ -178,13 +121,152 @@ CMD ["./your-application"]
 
 ## Notes
 
-- These files were generated for Ubuntu {release.capitalize()}
-- Configured for architectures: {', '.join(architectures)}
-- Generated on {datetime.datetime.now().strftime('%Y-%m-%d')}
+- These files were generated for Ubuntu ${release_cap}
+- Configured for architectures: ${archs}
 
 For more information, see the PoP documentation.
 """)
-    
+
+_MULTIARCH_TPL = string.Template("""# Multi-architecture Dockerfile for Ubuntu Pro container with PoP integration
+# For Ubuntu ${release_cap} on ${archs}
+
+# Use buildx and platform-specific base images
+FROM --platform=$$TARGETPLATFORM ubuntu:${release}
+
+# Add PoP repository files
+COPY etc/apt/sources.list.d/pop.list /etc/apt/sources.list.d/
+COPY etc/apt/auth.conf.d/91ubuntu-pro /etc/apt/auth.conf.d/
+COPY etc/apt/trusted.gpg.d/ /etc/apt/trusted.gpg.d/
+
+# Install Ubuntu Pro client
+RUN apt-get update && \\
+    apt-get install -y ubuntu-pro-client && \\
+    apt-get clean
+
+# Your application setup here
+# ...
+
+# Runtime configuration
+CMD ["/bin/bash"]
+""")
+
+_MULTIARCH_SH_TPL = string.Template("""#!/bin/bash
+# Multi-architecture build script for Ubuntu Pro container
+# For Ubuntu ${release_cap} on ${archs}
+
+set -e
+
+# Create buildx builder if it doesn't exist
+if ! docker buildx inspect pop-builder &>/dev/null; then
+  echo "Creating buildx builder instance..."
+  docker buildx create --name pop-builder --use
+fi
+
+# Build for multiple architectures
+docker buildx build --platform=${platforms} \\
+  -t pop-ubuntu:${release} \\
+  -f Dockerfile.multiarch \\
+  --push \\
+  .
+
+echo "Multi-architecture container image built successfully: pop-ubuntu:${release}"
+echo "Supported architectures: ${archs}"
+""")
+
+
+@functools.lru_cache(maxsize=64)
+def _render(template: string.Template, subs: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Render a precompiled template, memoized on the substitution values
+
+    Hot regeneration (e.g., a CI matrix re-creating templates for the
+    same release/architecture combination) reuses the rendered string
+    instead of re-scanning the template body.
+
+    Args:
+        template: Precompiled string.Template
+        subs: Substitution mapping as a sorted tuple of (key, value) pairs
+
+    Returns:
+        Rendered template text
+    """
+    return template.substitute(dict(subs))
+
+
+@functools.lru_cache(maxsize=64)
+def _render_bytes(template: string.Template, subs: Tuple[Tuple[str, str], ...]) -> bytes:
+    """
+    Render a precompiled template straight to UTF-8 bytes, memoized
+
+    The constant boilerplate dominates each payload, so caching the
+    encoded form means repeated builds pay the UTF-8 encode at most once
+    per unique (template, substitutions) pair.
+
+    Args:
+        template: Precompiled string.Template
+        subs: Substitution mapping as a sorted tuple of (key, value) pairs
+
+    Returns:
+        Rendered template payload as bytes
+    """
+    return _render(template, subs).encode('utf-8')
+
+
+def create_container_template(builds_dir: str, paths: Dict[str, str],
+                            release: str, architectures: List[str],
+                            hardlink: bool = False) -> Dict[str, Any]:
+    """
+    Create container build templates
+
+    Args:
+        builds_dir: Directory to store build files
+        paths: Dictionary of system paths
+        release: Ubuntu release codename (e.g., 'jammy')
+        architectures: List of architectures to support
+        hardlink: Hardlink repository files into the template instead of
+            copying when source and destination share a filesystem
+
+    Returns:
+        Dictionary with build information
+    """
+    logging.info("Creating container build templates")
+
+    # Materialize the timestamp once; it is recorded in the sidecar
+    iso = datetime.datetime.now().isoformat()
+
+    container_dir = os.path.join(builds_dir, "container")
+    os.makedirs(container_dir, exist_ok=True)
+
+    # Copy the shared apt configuration set (sources list, auth file,
+    # GPG keyrings) into the template
+    materialize_apt_tree(container_dir, paths, hardlink)
+
+    # Substitute into the precompiled templates, then write in one batch
+    subs = (
+        ("archs", ', '.join(architectures)),
+        ("release", release),
+        ("release_cap", release.capitalize()),
+    )
+
+    dockerfile_path = os.path.join(container_dir, "Dockerfile")
+    compose_path = os.path.join(container_dir, "docker-compose.yml")
+    build_script_path = os.path.join(container_dir, "build.sh")
+    readme_path = os.path.join(container_dir, "README.md")
+
+    # All four files resolve via openat against one container_dir
+    # descriptor; build.sh gets its executable mode at open time, so no
+    # separate chmod is required
+    write_files([
+        ("Dockerfile", _render_bytes(_DOCKERFILE_TPL, subs), 0o644),
+        ("docker-compose.yml", _render_bytes(_COMPOSE_TPL, subs), 0o644),
+        ("build.sh", _render_bytes(_BUILD_SH_TPL, subs), 0o755),
+        ("README.md", _render_bytes(_README_TPL, subs), 0o644),
+    ], base_dir=container_dir)
+
+    # Generation metadata goes to the sidecar, not the file bodies
+    write_meta(container_dir, generated=iso, release=release,
+               architectures=architectures)
+
     return {
         "dir": container_dir,
         "files": [
@@ -200,10 +282,10 @@ For more information, see the PoP documentation.
 def validate_container_template(container_dir: str) -> bool:
     """
     Validate container template files
-    
+
     Args:
         container_dir: Container template directory
-        
+
     Returns:
         True if valid, False otherwise
     """
@@ -216,98 +298,68 @@ def validate_container_template(container_dir: str) -> bool:
         "etc/apt/sources.list.d/pop.list",
         "etc/apt/auth.conf.d/91ubuntu-pro"
     ]
-    
+
+    # One scandir walk answers every existence question below without a
+    # stat() per required file
+    present = set(walk_relative(container_dir))
+
     # Check if all required files exist
-    for file_path in required_files:
-        full_path = os.path.join(container_dir, file_path)
-        if not os.path.exists(full_path):
+    missing = [f for f in required_files if f not in present]
+    if missing:
+        for file_path in missing:
             logging.warning(f"Missing required file: {file_path}")
-            return False
-    
+        return False
+
     # Check if GPG keys directory is not empty
-    gpg_dir = os.path.join(container_dir, "etc/apt/trusted.gpg.d")
-    if not os.path.exists(gpg_dir) or not os.listdir(gpg_dir):
+    gpg_prefix = os.path.join("etc/apt/trusted.gpg.d", "")
+    if not any(path.startswith(gpg_prefix) for path in present):
         logging.warning("GPG keys directory is empty or missing")
         return False
-    
+
     return True
 
 
 def create_multiarch_dockerfile(container_dir: str, release: str, architectures: List[str]) -> str:
     """
     Create a multi-architecture Dockerfile
-    
+
     Args:
         container_dir: Container template directory
         release: Ubuntu release codename
         architectures: List of architectures
-        
+
     Returns:
         Path to created Dockerfile
     """
     multiarch_path = os.path.join(container_dir, "Dockerfile.multiarch")
-    
+
+    # Materialize the timestamp once so both generated files share it
+    iso = datetime.datetime.now().isoformat()
+
     # Only include supported architectures for containers
-    supported_container_archs = [arch for arch in architectures 
+    supported_container_archs = [arch for arch in architectures
                               if arch in ["amd64", "arm64", "ppc64el", "s390x"]]
-    
+
     if not supported_container_archs:
         # Default to amd64 if no supported architectures
         supported_container_archs = ["amd64"]
-    
-    with open(multiarch_path, 'w') as f:
-        f.write(f"""# Multi-architecture Dockerfile for Ubuntu Pro container with PoP integration
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()} on {', '.join(supported_container_archs)}
 
-# Use buildx and platform-specific base images
-FROM --platform=$TARGETPLATFORM ubuntu:{release}
+    # Substitute into the precompiled templates, then write in one batch
+    subs = (
+        ("archs", ', '.join(supported_container_archs)),
+        ("platforms", ','.join(f'linux/{arch}' for arch in supported_container_archs)),
+        ("release", release),
+        ("release_cap", release.capitalize()),
+    )
 
-# Add PoP repository files
-COPY etc/apt/sources.list.d/pop.list /etc/apt/sources.list.d/
-COPY etc/apt/auth.conf.d/91ubuntu-pro /etc/apt/auth.conf.d/
-COPY etc/apt/trusted.gpg.d/ /etc/apt/trusted.gpg.d/
-
-# Install Ubuntu Pro client
-RUN apt-get update && \\
-    apt-get install -y ubuntu-pro-client && \\
-    apt-get clean
-
-# Your application setup here
-# ...
-
-# Runtime configuration
-CMD ["/bin/bash"]
-""")
-    
-    # Create build script for multi-arch
     script_path = os.path.join(container_dir, "build-multiarch.sh")
-    with open(script_path, 'w') as f:
-        f.write(f"""#!/bin/bash
-# Multi-architecture build script for Ubuntu Pro container
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()} on {', '.join(supported_container_archs)}
-
-set -e
 
-# Create buildx builder if it doesn't exist
-if ! docker buildx inspect pop-builder &>/dev/null; then
-  echo "Creating buildx builder instance..."
-  docker buildx create --name pop-builder --use
-fi
+    write_files([
+        ("Dockerfile.multiarch", _render_bytes(_MULTIARCH_TPL, subs), 0o644),
+        ("build-multiarch.sh", _render_bytes(_MULTIARCH_SH_TPL, subs), 0o755),
+    ], base_dir=container_dir)
 
-# Build for multiple architectures
-docker buildx build --platform={','.join([f'linux/{arch}' for arch in supported_container_archs])} \\
-  -t pop-ubuntu:{release} \\
-  -f Dockerfile.multiarch \\
-  --push \\
-  .
+    # Generation metadata goes to the sidecar, not the file bodies
+    write_meta(container_dir, multiarch_generated=iso)
 
-echo "Multi-architecture container image built successfully: pop-ubuntu:{release}"
-echo "Supported architectures: {', '.join(supported_container_archs)}"
-""")
-    
-    # Make the build script executable
-    os.chmod(script_path, 0o755)
-    
     return multiarch_path
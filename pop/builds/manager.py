@@ -5,12 +5,28 @@ Build template management for Ubuntu Pro on Premises (PoP)
 import os
 import logging
 import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 
 from pop.builds.vm import create_vm_template, validate_vm_template
 from pop.builds.container import create_container_template, validate_container_template
 from pop.builds.snap import create_snap_template, validate_snap_template
 
+# Build-type dispatch tables: one hash lookup instead of an if/elif
+# chain, shared by creation and validation
+_CREATORS = {
+    "vm": create_vm_template,
+    "container": create_container_template,
+    "snap": create_snap_template,
+}
+
+_VALIDATORS = {
+    "vm": validate_vm_template,
+    "container": validate_container_template,
+    "snap": validate_snap_template,
+}
+
 
 def create_build_templates(paths: Dict[str, str], resources: Dict[str, str],
                           release: str, architectures: List[str], 
@@ -40,27 +56,28 @@ def create_build_templates(paths: Dict[str, str], resources: Dict[str, str],
         "results": {}
     }
     
-    # Process each requested build type
-    for build_type in build_types:
-        if build_type == "vm":
-            # Create VM templates
-            vm_result = create_vm_template(builds_dir, paths, release, architectures)
-            results["results"]["vm"] = vm_result
-        elif build_type == "container":
-            # Create container templates
-            container_result = create_container_template(builds_dir, paths, release, architectures)
-            results["results"]["container"] = container_result
-        elif build_type == "snap":
-            # Create snap templates
-            snap_result = create_snap_template(builds_dir, paths, release, architectures)
-            results["results"]["snap"] = snap_result
-        else:
-            logging.warning(f"Unknown build type: {build_type}")
-            results["results"][build_type] = {
-                "status": "error",
-                "message": f"Unknown build type: {build_type}"
-            }
-    
+    # Each build type writes to its own subdirectory, so the work is
+    # independent and I/O-bound; run the creators concurrently
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max(len(build_types), 1)) as executor:
+        for build_type in build_types:
+            creator = _CREATORS.get(build_type)
+            if creator is None:
+                logging.warning(f"Unknown build type: {build_type}")
+                results["results"][build_type] = {
+                    "status": "error",
+                    "message": f"Unknown build type: {build_type}"
+                }
+                continue
+            futures[build_type] = executor.submit(creator, builds_dir, paths,
+                                                  release, architectures)
+
+        for build_type, future in futures.items():
+            results["results"][build_type] = future.result()
+
+    # Template directories changed; drop any memoized validation results
+    _validate_template.cache_clear()
+
     # Create top-level README
     create_builds_readme(builds_dir, build_types, release, architectures)
     
@@ -83,7 +100,10 @@ def create_builds_readme(builds_dir: str, build_types: List[str],
         Path to created README
     """
     readme_path = os.path.join(builds_dir, "README.md")
-    
+
+    # Materialize the timestamp once at function entry
+    generated = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
     with open(readme_path, 'w') as f:
         f.write(f"""# PoP Build Files
 
@@ -108,7 +128,7 @@ Each build directory contains:
 
 - Ubuntu Release: {release}
 - Architectures: {', '.join(architectures)}
-- Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+- Generated: {generated}
 
 For assistance, contact your Canonical representative.
 """)
@@ -131,21 +151,40 @@ def validate_build_templates(paths: Dict[str, str], build_types: List[str]) -> D
     results = {}
     
     for build_type in build_types:
-        if build_type == "vm":
-            vm_dir = os.path.join(builds_dir, "vm")
-            results["vm"] = validate_vm_template(vm_dir)
-        elif build_type == "container":
-            container_dir = os.path.join(builds_dir, "container")
-            results["container"] = validate_container_template(container_dir)
-        elif build_type == "snap":
-            snap_dir = os.path.join(builds_dir, "snap")
-            results["snap"] = validate_snap_template(snap_dir)
-        else:
+        template_dir = os.path.join(builds_dir, build_type)
+        try:
+            mtime_ns = os.stat(template_dir).st_mtime_ns
+        except OSError:
             results[build_type] = False
+            continue
+        results[build_type] = _validate_template(build_type, template_dir, mtime_ns)
     
     return results
 
 
+@functools.lru_cache(maxsize=64)
+def _validate_template(build_type: str, template_dir: str, mtime_ns: int) -> bool:
+    """
+    Validate one template directory, memoized on its mtime
+
+    On the common unchanged path a single stat() in the caller replaces
+    the per-file existence walk; create_build_templates clears the cache
+    after regenerating templates.
+
+    Args:
+        build_type: Build type being validated
+        template_dir: Template directory for that build type
+        mtime_ns: Directory mtime in nanoseconds (cache key component)
+
+    Returns:
+        True if valid, False otherwise
+    """
+    validator = _VALIDATORS.get(build_type)
+    if validator is None:
+        return False
+    return validator(template_dir)
+
+
 def list_available_templates(paths: Dict[str, str]) -> Dict[str, List[str]]:
     """
     List available build templates
@@ -162,36 +201,27 @@ def list_available_templates(paths: Dict[str, str]) -> Dict[str, List[str]]:
         "container": [],
         "snap": []
     }
-    
-    if not os.path.exists(builds_dir):
-        return results
-    
-    # Check for VM templates
-    vm_dir = os.path.join(builds_dir, "vm")
-    if os.path.exists(vm_dir):
-        # Look for README.md, cloud-init.yaml, etc.
-        vm_files = os.listdir(vm_dir)
-        results["vm"] = [f for f in vm_files if os.path.isfile(os.path.join(vm_dir, f))]
-    
-    # Check for container templates
-    container_dir = os.path.join(builds_dir, "container")
-    if os.path.exists(container_dir):
-        # Look for Dockerfile, docker-compose.yml, etc.
-        container_files = os.listdir(container_dir)
-        results["container"] = [f for f in container_files if os.path.isfile(os.path.join(container_dir, f))]
-    
-    # Check for snap templates
+
+    def list_files(directory: str) -> List[str]:
+        # One scandir pass gives entry types from the directory read
+        # itself; a missing directory folds into the same syscall
+        try:
+            with os.scandir(directory) as entries:
+                return [entry.name for entry in entries if entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    # Check for VM templates (README.md, cloud-init.yaml, etc.)
+    results["vm"] = list_files(os.path.join(builds_dir, "vm"))
+
+    # Check for container templates (Dockerfile, docker-compose.yml, etc.)
+    results["container"] = list_files(os.path.join(builds_dir, "container"))
+
+    # Check for snap templates: snap directory with snapcraft.yaml,
+    # plus any files at the snap template root
     snap_dir = os.path.join(builds_dir, "snap")
-    if os.path.exists(snap_dir):
-        # Look for snap directory with snapcraft.yaml
-        if os.path.exists(os.path.join(snap_dir, "snap")):
-            snap_files = os.listdir(os.path.join(snap_dir, "snap"))
-            if "snapcraft.yaml" in snap_files:
-                results["snap"].append("snapcraft.yaml")
-        
-        # Look for other files
-        snap_files = os.listdir(snap_dir)
-        root_files = [f for f in snap_files if os.path.isfile(os.path.join(snap_dir, f))]
-        results["snap"].extend(root_files)
-    
+    if "snapcraft.yaml" in list_files(os.path.join(snap_dir, "snap")):
+        results["snap"].append("snapcraft.yaml")
+    results["snap"].extend(list_files(snap_dir))
+
     return results
@@ -3,87 +3,37 @@ Snap build template management for Ubuntu Pro on Premises (PoP)
 """
 
 import os
+import json
 import logging
-import shutil
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 
+from pop.builds.common import materialize_apt_tree, walk_relative, write_files, write_meta
 
-def create_snap_template(builds_dir: str, paths: Dict[str, str], 
-                       release: str, architectures: List[str]) -> Dict[str, Any]:
-    """
-    Create snap package build templates
-    
-    Args:
-        builds_dir: Directory to store build files
-        paths: Dictionary of system paths
-        release: Ubuntu release codename (e.g., 'jammy')
-        architectures: List of architectures to support
-        
-    Returns:
-        Dictionary with build information
-    """
-    logging.info("Creating snap build templates")
-    
-    snap_dir = os.path.join(builds_dir, "snap")
-    os.makedirs(snap_dir, exist_ok=True)
-    
-    # Files to copy from the repository
-    files = [
-        {"src": paths["pop_apt_mirror_list"], "dst": "etc/apt/sources.list.d/pop.list"},
-        {"src": paths["pop_apt_auth_file"], "dst": "etc/apt/auth.conf.d/91ubuntu-pro"},
-        {"src": paths["pop_gpg_dir"], "dst": "etc/apt/trusted.gpg.d/"},
-    ]
-    
-    # Create subdirectories for file structure
-    for file_info in files:
-        dst_path = os.path.join(snap_dir, file_info["dst"])
-        dst_dir = os.path.dirname(dst_path)
-        os.makedirs(dst_dir, exist_ok=True)
-    
-    # Copy files
-    for file_info in files:
-        src_path = file_info["src"]
-        dst_path = os.path.join(snap_dir, file_info["dst"])
-        
-        if os.path.isdir(src_path):
-            if os.path.exists(dst_path):
-                shutil.rmtree(dst_path)
-            shutil.copytree(src_path, dst_path)
-        else:
-            shutil.copy2(src_path, dst_path)
-            
-        logging.debug(f"Copied {src_path} to {dst_path}")
-    
-    # Map Ubuntu release to core base
-    core_mapping = {
-        "focal": "core20",
-        "jammy": "core22",
-        "noble": "core24"
-    }
-    
-    # Default to core22 if release not in mapping
-    core_base = core_mapping.get(release, "core22")
-    
-    # Create snapcraft.yaml template
-    snapcraft_path = os.path.join(snap_dir, "snap/snapcraft.yaml")
-    os.makedirs(os.path.dirname(snapcraft_path), exist_ok=True)
-    
-    with open(snapcraft_path, 'w') as f:
-        f.write(f"""name: my-pop-enabled-app  # Change this to your app name
+# Static payload segments are encoded to bytes once at import time;
+# dynamic pieces are spliced between them and each file goes out in a
+# single writev call
+_SNAPCRAFT_PROLOG = b"""name: my-pop-enabled-app  # Change this to your app name
 version: '0.1'  # Your app version
 summary: An application with PoP integration
 description: |
   This is a snap application with Ubuntu Pro on Premises integration.
-  
-  This template provides a base configuration for building snaps with 
-  Ubuntu Pro on Premises (PoP) integration, allowing secure access to 
+
+  This template provides a base configuration for building snaps with
+  Ubuntu Pro on Premises (PoP) integration, allowing secure access to
   Ubuntu Pro services in air-gapped environments.
 
-base: {core_base}
+base: """
+
+_SNAPCRAFT_MID = b"""
 confinement: strict
 grade: stable
+"""
 
+# Slot between _SNAPCRAFT_MID and _SNAPCRAFT_TAIL holds the optional
+# architectures line; single-arch templates leave it empty
+_SNAPCRAFT_TAIL = b"""
 parts:
   my-part:  # Change this to your app's part name
     plugin: nil
@@ -105,35 +55,9 @@ apps:
     plugs:
       - network
       - network-bind
-""")
-    
-    # Create build script
-    build_script_path = os.path.join(snap_dir, "build.sh")
-    with open(build_script_path, 'w') as f:
-        f.write(f"""#!/bin/bash
-# Build script for Ubuntu Pro snap
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()} with {core_base}
-
-set -e
-
-# Build the snap package
-snapcraft
+"""
 
-echo "Snap package built successfully"
-echo "To install: sudo snap install my-pop-enabled-app_0.1_*.snap --dangerous"
-""")
-    
-    # Make the build script executable
-    os.chmod(build_script_path, 0o755)
-    
-    # Create hooks directory and pre-refresh hook
-    hooks_dir = os.path.join(snap_dir, "snap/hooks")
-    os.makedirs(hooks_dir, exist_ok=True)
-    
-    pre_refresh_path = os.path.join(hooks_dir, "pre-refresh")
-    with open(pre_refresh_path, 'w') as f:
-        f.write("""#!/bin/sh
+_PRE_REFRESH_HOOK = b"""#!/bin/sh
 # Pre-refresh hook for Ubuntu Pro snap
 # This hook runs before the snap is refreshed
 
@@ -143,15 +67,9 @@ if [ -f "$SNAP_DATA/etc/ubuntu-pro/ubuntu-pro.cfg" ]; then
 fi
 
 exit 0
-""")
-    
-    # Make the hook executable
-    os.chmod(pre_refresh_path, 0o755)
-    
-    # Create post-refresh hook
-    post_refresh_path = os.path.join(hooks_dir, "post-refresh")
-    with open(post_refresh_path, 'w') as f:
-        f.write("""#!/bin/sh
+"""
+
+_POST_REFRESH_HOOK = b"""#!/bin/sh
 # Post-refresh hook for Ubuntu Pro snap
 # This hook runs after the snap is refreshed
 
@@ -162,15 +80,9 @@ if [ -f "$SNAP_COMMON/ubuntu-pro.cfg.backup" ]; then
 fi
 
 exit 0
-""")
-    
-    # Make the hook executable
-    os.chmod(post_refresh_path, 0o755)
-    
-    # Create README.md with instructions
-    readme_path = os.path.join(snap_dir, "README.md")
-    with open(readme_path, 'w') as f:
-        f.write(f"""# PoP Snap Build Files
+"""
+
+_README_PROLOG = b"""# PoP Snap Build Files
 
 This directory contains files needed to build a snap package with Ubuntu Pro on Premises (PoP) integration.
 
@@ -237,12 +149,105 @@ These hooks help preserve Ubuntu Pro configuration during updates.
 
 ## Notes
 
-- These files were generated for Ubuntu {release.capitalize()} with {core_base}
-- Configured for architectures: {', '.join(architectures)}
-- Generated on {datetime.datetime.now().strftime('%Y-%m-%d')}
+"""
+
+
+def create_snap_template(builds_dir: str, paths: Dict[str, str], 
+                       release: str, architectures: List[str]) -> Dict[str, Any]:
+    """
+    Create snap package build templates
+    
+    Args:
+        builds_dir: Directory to store build files
+        paths: Dictionary of system paths
+        release: Ubuntu release codename (e.g., 'jammy')
+        architectures: List of architectures to support
+        
+    Returns:
+        Dictionary with build information
+    """
+    logging.info("Creating snap build templates")
+    
+    # Materialize the timestamps and derived strings once; every payload
+    # below reuses the same locals
+    now = datetime.datetime.now()
+    iso = now.isoformat()
+    date = now.strftime('%Y-%m-%d')
+    release_cap = release.capitalize()
+    archs = ', '.join(architectures)
+    
+    snap_dir = os.path.join(builds_dir, "snap")
+    os.makedirs(snap_dir, exist_ok=True)
+    
+    # Map Ubuntu release to core base
+    core_mapping = {
+        "focal": "core20",
+        "jammy": "core22",
+        "noble": "core24"
+    }
+    
+    # Default to core22 if release not in mapping
+    core_base = core_mapping.get(release, "core22")
+    
+    # Create snapcraft.yaml template
+    snapcraft_path = os.path.join(snap_dir, "snap/snapcraft.yaml")
+    os.makedirs(os.path.dirname(snapcraft_path), exist_ok=True)
+    
+    snapcraft_segments = (_SNAPCRAFT_PROLOG, core_base.encode('utf-8'),
+                          _SNAPCRAFT_MID, b"", _SNAPCRAFT_TAIL)
+    
+    # Create build script
+    build_script_path = os.path.join(snap_dir, "build.sh")
+    build_script_payload = f"""#!/bin/bash
+# Build script for Ubuntu Pro snap
+# Generated: {iso}
+# For Ubuntu {release_cap} with {core_base}
+
+set -e
+
+# Build the snap package
+snapcraft
+
+echo "Snap package built successfully"
+echo "To install: sudo snap install my-pop-enabled-app_0.1_*.snap --dangerous"
+"""
+    
+    # Create hooks directory and hook scripts
+    hooks_dir = os.path.join(snap_dir, "snap/hooks")
+    os.makedirs(hooks_dir, exist_ok=True)
+    
+    pre_refresh_path = os.path.join(hooks_dir, "pre-refresh")
+    post_refresh_path = os.path.join(hooks_dir, "post-refresh")
+
+    # Create README with instructions; only the Notes tail is dynamic
+    readme_path = os.path.join(snap_dir, "README.md")
+    readme_tail = f"""- These files were generated for Ubuntu {release_cap} with {core_base}
+- Configured for architectures: {archs}
+- Generated on {date}
 
 For more information, see the PoP documentation.
-""")
+"""
+    readme_segments = (_README_PROLOG, readme_tail)
+    
+    # The apt configuration copy (dominated by the GPG keyring tree) and
+    # the template writes touch disjoint paths, so overlap them; all
+    # directories were created serially above to avoid races. Scripts
+    # and hooks get their executable mode at open time, so no separate
+    # chmod is required
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        copy_future = executor.submit(materialize_apt_tree, snap_dir, paths)
+        write_files([
+            ("snap/snapcraft.yaml", snapcraft_segments, 0o644),
+            ("build.sh", build_script_payload, 0o755),
+            ("snap/hooks/pre-refresh", _PRE_REFRESH_HOOK, 0o755),
+            ("snap/hooks/post-refresh", _POST_REFRESH_HOOK, 0o755),
+            ("README.md", readme_segments, 0o644),
+        ], base_dir=snap_dir)
+        copy_future.result()
+    
+    # Record the core base so create_multiarch_snap_config can rebuild
+    # snapcraft.yaml from segments without reading it back
+    write_meta(snap_dir, core_base=core_base)
     
     return {
         "dir": snap_dir,
@@ -276,23 +281,26 @@ def validate_snap_template(snap_dir: str) -> bool:
         "etc/apt/auth.conf.d/91ubuntu-pro"
     ]
     
+    # One scandir walk answers every existence question below without a
+    # stat() per required file
+    present = set(walk_relative(snap_dir))
+    
     # Check if all required files exist
-    for file_path in required_files:
-        full_path = os.path.join(snap_dir, file_path)
-        if not os.path.exists(full_path):
+    missing = [f for f in required_files if f not in present]
+    if missing:
+        for file_path in missing:
             logging.warning(f"Missing required file: {file_path}")
-            return False
+        return False
     
     # Check if GPG keys directory is not empty
-    gpg_dir = os.path.join(snap_dir, "etc/apt/trusted.gpg.d")
-    if not os.path.exists(gpg_dir) or not os.listdir(gpg_dir):
+    gpg_prefix = os.path.join("etc/apt/trusted.gpg.d", "")
+    if not any(path.startswith(gpg_prefix) for path in present):
         logging.warning("GPG keys directory is empty or missing")
         return False
     
     # Check if hook files exist
-    hooks_dir = os.path.join(snap_dir, "snap/hooks")
-    if not os.path.exists(os.path.join(hooks_dir, "pre-refresh")) or \
-       not os.path.exists(os.path.join(hooks_dir, "post-refresh")):
+    if os.path.join("snap/hooks", "pre-refresh") not in present or \
+       os.path.join("snap/hooks", "post-refresh") not in present:
         logging.warning("Missing hook files")
         return False
     
@@ -319,28 +327,30 @@ def create_multiarch_snap_config(snap_dir: str, architectures: List[str]) -> str
         supported_snap_archs = ["amd64"]
     
     multiarch_path = os.path.join(snap_dir, "snap/snapcraft-multiarch.yaml")
+
+    # Compute the timestamp and the joined architecture list once
+    iso = datetime.datetime.now().isoformat()
+    arch_list = ', '.join(supported_snap_archs)
+
+    # Rebuild snapcraft.yaml from the prebuilt segments with the
+    # architectures slot filled in; no read-back or str.replace scan of
+    # the existing file is needed, only the core base from the sidecar
+    try:
+        with open(os.path.join(snap_dir, ".meta.json")) as f:
+            core_base = json.load(f).get("core_base", "core22")
+    except (OSError, ValueError):
+        core_base = "core22"
     
-    # Read existing snapcraft.yaml
-    with open(os.path.join(snap_dir, "snap/snapcraft.yaml"), 'r') as f:
-        content = f.read()
-    
-    # Add architectures field
-    modified_content = content.replace(
-        "grade: stable",
-        f"grade: stable\narchitectures: [{', '.join(supported_snap_archs)}]"
-    )
-    
-    # Write multiarch snapcraft.yaml
-    with open(multiarch_path, 'w') as f:
-        f.write(modified_content)
+    multiarch_segments = (_SNAPCRAFT_PROLOG, core_base.encode('utf-8'),
+                          _SNAPCRAFT_MID, f"architectures: [{arch_list}]\n",
+                          _SNAPCRAFT_TAIL)
     
     # Create build script for multi-arch
     script_path = os.path.join(snap_dir, "build-multiarch.sh")
-    with open(script_path, 'w') as f:
-        f.write(f"""#!/bin/bash
+    script_payload = f"""#!/bin/bash
 # Multi-architecture build script for Ubuntu Pro snap
-# Generated: {datetime.datetime.now().isoformat()}
-# For architectures: {', '.join(supported_snap_archs)}
+# Generated: {iso}
+# For architectures: {arch_list}
 
 set -e
 
@@ -352,9 +362,13 @@ snapcraft --use-lxd --target-arch={supported_snap_archs[0]} --file snap/snapcraf
 
 echo "Snap package built successfully for {supported_snap_archs[0]}"
 echo "To build for other architectures, uncomment the additional commands"
-""")
-    
-    # Make the build script executable
-    os.chmod(script_path, 0o755)
-    
+"""
+
+    # Write both files in one batch; the build script gets its
+    # executable mode at open time
+    write_files([
+        ("snap/snapcraft-multiarch.yaml", multiarch_segments, 0o644),
+        ("build-multiarch.sh", script_payload, 0o755),
+    ], base_dir=snap_dir)
+
     return multiarch_path
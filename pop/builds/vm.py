@@ -4,95 +4,43 @@ VM build template management for Ubuntu Pro on Premises (PoP)
 
 import os
 import logging
-import shutil
 import datetime
 from typing import Dict, List, Any
 
-def create_vm_template(builds_dir: str, paths: Dict[str, str], 
-                     release: str, architectures: List[str]) -> Dict[str, Any]:
-    """
-    Create virtual machine build templates
-    
-    Args:
-        builds_dir: Directory to store build files
-        paths: Dictionary of system paths
-        release: Ubuntu release codename (e.g., 'jammy')
-        architectures: List of architectures to support
-        
-    Returns:
-        Dictionary with build information
-    """
-    logging.info("Creating VM build templates")
-    
-    vm_dir = os.path.join(builds_dir, "vm")
-    os.makedirs(vm_dir, exist_ok=True)
-    
-    # Files to copy from the repository
-    files = [
-        {"src": paths["pop_apt_mirror_list"], "dst": "etc/apt/sources.list.d/pop.list"},
-        {"src": paths["pop_apt_auth_file"], "dst": "etc/apt/auth.conf.d/91ubuntu-pro"},
-        {"src": paths["pop_gpg_dir"], "dst": "etc/apt/trusted.gpg.d/"},
-    ]
-    
-    # Create subdirectories for file structure
-    for file_info in files:
-        dst_path = os.path.join(vm_dir, file_info["dst"])
-        dst_dir = os.path.dirname(dst_path)
-        os.makedirs(dst_dir, exist_ok=True)
-    
-    # Copy files
-    for file_info in files:
-        src_path = file_info["src"]
-        dst_path = os.path.join(vm_dir, file_info["dst"])
-        
-        if os.path.isdir(src_path):
-            if os.path.exists(dst_path):
-                shutil.rmtree(dst_path)
-            shutil.copytree(src_path, dst_path)
-        else:
-            shutil.copy2(src_path, dst_path)
-            
-        logging.debug(f"Copied {src_path} to {dst_path}")
-    
-    # Create cloud-init.yaml template
-    cloud_init_path = os.path.join(vm_dir, "cloud-init.yaml")
-    with open(cloud_init_path, 'w') as f:
-        f.write(f"""# Cloud-init configuration for PoP VM
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()}
+from pop.builds.common import materialize_apt_tree, walk_relative, write_files
+
+# Static template bodies are encoded to bytes once at import time; the
+# few dynamic fields are spliced in with bytes %-formatting per call
+_CLOUD_INIT_TMPL = b"""# Cloud-init configuration for PoP VM
+# Generated: %(iso)s
+# For Ubuntu %(release_cap)s
 
 apt:
   sources_list: |
     # Managed by PoP
-    deb http://archive.ubuntu.com/ubuntu/ {release} main restricted universe multiverse
-    deb http://archive.ubuntu.com/ubuntu/ {release}-updates main restricted universe multiverse
-    deb http://archive.ubuntu.com/ubuntu/ {release}-security main restricted universe multiverse
+    deb http://archive.ubuntu.com/ubuntu/ %(release)s main restricted universe multiverse
+    deb http://archive.ubuntu.com/ubuntu/ %(release)s-updates main restricted universe multiverse
+    deb http://archive.ubuntu.com/ubuntu/ %(release)s-security main restricted universe multiverse
 
 packages:
   - ubuntu-pro-client
 
 runcmd:
   - [pro, attach, --no-auto-enable, "$POP_TOKEN"]
-""")
-    
-    # Create grub.cfg for FIPS
-    grub_path = os.path.join(vm_dir, "grub.cfg")
-    with open(grub_path, 'w') as f:
-        f.write(f"""# GRUB configuration for PoP VM with FIPS enabled
-# Generated: {datetime.datetime.now().isoformat()}
-# For Ubuntu {release.capitalize()}
+"""
+
+_GRUB_CFG_TMPL = b"""# GRUB configuration for PoP VM with FIPS enabled
+# Generated: %(iso)s
+# For Ubuntu %(release_cap)s
 
 GRUB_CMDLINE_LINUX="$GRUB_CMDLINE_LINUX fips=1"
 GRUB_TERMINAL="console"
 GRUB_TIMEOUT=5
 GRUB_DISTRIBUTOR="Ubuntu Pro"
 GRUB_DEFAULT=0
-""")
-    
-    # Create README.md with instructions
-    readme_path = os.path.join(vm_dir, "README.md")
-    with open(readme_path, 'w') as f:
-        f.write(f"""# PoP VM Build Files
+"""
+
+_README_PROLOG = b"""# PoP VM Build Files
 
 This directory contains files needed to build a virtual machine with Ubuntu Pro on Premises (PoP) integration.
 
@@ -117,41 +65,11 @@ This VM template includes FIPS mode enabled by default via the kernel parameter
 
 ## Notes
 
-- These files were generated for Ubuntu {release.capitalize()}
-- Configured for architectures: {', '.join(architectures)}
-- Generated on {datetime.datetime.now().strftime('%Y-%m-%d')}
-
-For more information, see the PoP documentation.
-""")
-    
-    return {
-        "dir": vm_dir,
-        "files": [
-            cloud_init_path,
-            grub_path,
-            readme_path
-        ],
-        "status": "success"
-    }
-
+"""
 
-def create_fips_startup_script(vm_dir: str, release: str) -> str:
-    """
-    Create FIPS startup script for VM
-    
-    Args:
-        vm_dir: Directory to store build files
-        release: Ubuntu release codename (e.g., 'jammy')
-        
-    Returns:
-        Path to created script
-    """
-    script_path = os.path.join(vm_dir, "enable-fips.sh")
-    
-    with open(script_path, 'w') as f:
-        f.write(f"""#!/bin/bash
-# FIPS enablement script for Ubuntu {release.capitalize()}
-# Generated: {datetime.datetime.now().isoformat()}
+_FIPS_SCRIPT_TMPL = b"""#!/bin/bash
+# FIPS enablement script for Ubuntu %(release_cap)s
+# Generated: %(iso)s
 
 set -e
 
@@ -181,20 +99,106 @@ EOF
 update-grub
 
 echo "FIPS configuration complete. Please reboot your system."
-""")
-    
-    # Make the script executable
-    os.chmod(script_path, 0o755)
+"""
+
+
+def create_vm_template(builds_dir: str, paths: Dict[str, str],
+                     release: str, architectures: List[str]) -> Dict[str, Any]:
+    """
+    Create virtual machine build templates
+
+    Args:
+        builds_dir: Directory to store build files
+        paths: Dictionary of system paths
+        release: Ubuntu release codename (e.g., 'jammy')
+        architectures: List of architectures to support
+
+    Returns:
+        Dictionary with build information
+    """
+    logging.info("Creating VM build templates")
+
+    # Materialize the timestamps and derived strings once; every payload
+    # below reuses the same locals
+    now = datetime.datetime.now()
+    iso = now.isoformat()
+    date = now.strftime('%Y-%m-%d')
+    release_cap = release.capitalize()
+    archs = ', '.join(architectures)
+
+    vm_dir = os.path.join(builds_dir, "vm")
+    os.makedirs(vm_dir, exist_ok=True)
+
+    # Copy the shared apt configuration set (sources list, auth file,
+    # GPG keyrings) into the template
+    materialize_apt_tree(vm_dir, paths)
+
+    # Splice the dynamic fields into the precompiled bodies
+    subs = {
+        b"iso": iso.encode('utf-8'),
+        b"release": release.encode('utf-8'),
+        b"release_cap": release_cap.encode('utf-8'),
+    }
+
+    cloud_init_path = os.path.join(vm_dir, "cloud-init.yaml")
+    grub_path = os.path.join(vm_dir, "grub.cfg")
+    readme_path = os.path.join(vm_dir, "README.md")
+
+    # README instructions are static; only the Notes tail is dynamic
+    readme_tail = f"""- These files were generated for Ubuntu {release_cap}
+- Configured for architectures: {archs}
+- Generated on {date}
+
+For more information, see the PoP documentation.
+"""
+
+    write_files([
+        ("cloud-init.yaml", _CLOUD_INIT_TMPL % subs, 0o644),
+        ("grub.cfg", _GRUB_CFG_TMPL % subs, 0o644),
+        ("README.md", (_README_PROLOG, readme_tail), 0o644),
+    ], base_dir=vm_dir)
+
+    return {
+        "dir": vm_dir,
+        "files": [
+            cloud_init_path,
+            grub_path,
+            readme_path
+        ],
+        "status": "success"
+    }
+
+
+def create_fips_startup_script(vm_dir: str, release: str) -> str:
+    """
+    Create FIPS startup script for VM
+
+    Args:
+        vm_dir: Directory to store build files
+        release: Ubuntu release codename (e.g., 'jammy')
+
+    Returns:
+        Path to created script
+    """
+    script_path = os.path.join(vm_dir, "enable-fips.sh")
+
+    # Splice the dynamic header fields into the precompiled body; the
+    # script gets its executable mode at open time
+    payload = _FIPS_SCRIPT_TMPL % {
+        b"iso": datetime.datetime.now().isoformat().encode('utf-8'),
+        b"release_cap": release.capitalize().encode('utf-8'),
+    }
+    write_files([("enable-fips.sh", payload, 0o755)], base_dir=vm_dir)
     return script_path
 
 
 def validate_vm_template(vm_dir: str) -> bool:
     """
     Validate VM template files
-    
+
     Args:
         vm_dir: VM template directory
-        
+
     Returns:
         True if valid, False otherwise
     """
@@ -206,18 +210,22 @@ def validate_vm_template(vm_dir: str) -> bool:
         "etc/apt/sources.list.d/pop.list",
         "etc/apt/auth.conf.d/91ubuntu-pro"
     ]
-    
+
+    # One scandir walk answers every existence question below without a
+    # stat() per required file
+    present = set(walk_relative(vm_dir))
+
     # Check if all required files exist
-    for file_path in required_files:
-        full_path = os.path.join(vm_dir, file_path)
-        if not os.path.exists(full_path):
+    missing = [f for f in required_files if f not in present]
+    if missing:
+        for file_path in missing:
             logging.warning(f"Missing required file: {file_path}")
-            return False
-    
+        return False
+
     # Check if GPG keys directory is not empty
-    gpg_dir = os.path.join(vm_dir, "etc/apt/trusted.gpg.d")
-    if not os.path.exists(gpg_dir) or not os.listdir(gpg_dir):
+    gpg_prefix = os.path.join("etc/apt/trusted.gpg.d", "")
+    if not any(path.startswith(gpg_prefix) for path in present):
         logging.warning("GPG keys directory is empty or missing")
         return False
-    
+
     return True
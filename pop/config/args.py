@@ -3,9 +3,13 @@ Command-line argument handling for Ubuntu Pro on Premises (PoP)
 """
 
 import argparse
+import csv
+import datetime
+import functools
+import re
 import sys
 import logging
-import subprocess
+import socket
 from typing import Dict, List
 
 # Define constants
@@ -16,52 +20,59 @@ SUPPORTED_ARCHITECTURES = ["amd64", "arm64", "i386", "ppc64el", "s390x", "riscv6
 SUPPORTED_RELEASES = ["trusty", "xenial", "bionic", "focal", "jammy", "noble"]  # ESM + Active LTS
 BUILD_TYPES = ["vm", "container", "snap"]
 
+# Frozen views for O(1) membership tests during validation
+_SUPPORTED_ARCHITECTURE_SET = frozenset(SUPPORTED_ARCHITECTURES)
+_BUILD_TYPE_SET = frozenset(BUILD_TYPES)
 
+# Splits comma-separated option values and strips whitespace in one pass
+_CSV_RE = re.compile(r"[^,\s]+")
+
+
+@functools.lru_cache(maxsize=1)
 def get_current_lts() -> str:
-    """Get the current LTS release codename"""
+    """Get the current LTS release codename (cached per process)"""
+    # ubuntu-distro-info just reads this table; parsing it directly
+    # skips a fork/exec and interpreter launch on every run
     try:
-        lts = subprocess.check_output(
-            ["ubuntu-distro-info", "-c", "--lts"], 
-            text=True
-        ).strip()
-        return lts.lower()
-    except (subprocess.SubprocessError, FileNotFoundError):
-        logging.warning(f"Could not determine current LTS, using default: {DEFAULT_RELEASE}")
-        return DEFAULT_RELEASE
+        today = datetime.date.today().isoformat()
+        with open("/usr/share/distro-info/ubuntu.csv", newline="") as csv_file:
+            released_lts = [
+                row["series"]
+                for row in csv.DictReader(csv_file)
+                if row["version"].endswith("LTS") and row["release"] <= today
+            ]
+        if released_lts:
+            return released_lts[-1]
+    except (OSError, KeyError, csv.Error):
+        pass
+    logging.warning(f"Could not determine current LTS, using default: {DEFAULT_RELEASE}")
+    return DEFAULT_RELEASE
 
 
+@functools.lru_cache(maxsize=1)
 def get_system_fqdn_or_ip() -> str:
-    """Get the system's FQDN or IP address for use as default mirror host"""
-    try:
-        # First try to get FQDN using hostname -f
-        fqdn = subprocess.check_output(["hostname", "-f"], text=True).strip()
-        if fqdn and not fqdn.startswith("localhost"):
-            return fqdn
-    except subprocess.SubprocessError:
-        pass
-    
-    # If FQDN not available, try to get the primary IP address
+    """Get the system's FQDN or IP address for use as default mirror host (cached per process)"""
+    # socket.getfqdn asks the resolver directly instead of forking
+    # hostname -f
+    fqdn = socket.getfqdn()
+    if fqdn and not fqdn.startswith("localhost"):
+        return fqdn
+    
+    # If FQDN not available, pick the first non-localhost address
     try:
-        # Get all IP addresses and pick the first non-localhost one
-        ip_output = subprocess.check_output(
-            ["hostname", "-I"], text=True
-        ).strip().split()
-        
-        for ip in ip_output:
+        for ip in socket.gethostbyname_ex(socket.gethostname())[2]:
             if not ip.startswith("127."):
                 return ip
-    except subprocess.SubprocessError:
+    except OSError:
         pass
     
     # Fallback to localhost if nothing else works
     return "localhost"
 
 
-def parse_arguments() -> argparse.Namespace:
-    """Parse command-line arguments"""
-    # Get system FQDN or IP as default for mirror host
-    default_mirror_host = get_system_fqdn_or_ip()
-    
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser once per process"""
     parser = argparse.ArgumentParser(
         description="Ubuntu Pro on Premises (PoP) Configuration",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
@@ -73,8 +84,11 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--dir", dest="pop_dir", default="/srv/pop",
                         help="Base directory for PoP installation")
     
-    parser.add_argument("--release", choices=SUPPORTED_RELEASES, default=get_current_lts(),
-                        help="Ubuntu release to configure")
+    # SUPPRESS keeps the attribute unset (and out of --help) until
+    # _process_arguments resolves it, so help never forks a subprocess
+    parser.add_argument("--release", choices=SUPPORTED_RELEASES,
+                        default=argparse.SUPPRESS,
+                        help="Ubuntu release to configure (default: current LTS)")
     
     parser.add_argument("--arch", dest="architectures", 
                         default=",".join(DEFAULT_ARCHITECTURES),
@@ -99,8 +113,9 @@ def parse_arguments() -> argparse.Namespace:
                         help=f"Build types to support in file map (comma-separated: {', '.join(BUILD_TYPES)})")
     
     parser.add_argument("--mirror-host", dest="mirror_host",
-                        default=default_mirror_host,
-                        help="Host FQDN/IP for the local mirror (overrides default URLs)")
+                        default=argparse.SUPPRESS,
+                        help="Host FQDN/IP for the local mirror "
+                             "(default: system FQDN/IP)")
     
     parser.add_argument("--mirror-port", dest="mirror_port", type=int, default=80,
                         help="Port for the local mirror server")
@@ -145,6 +160,9 @@ def parse_arguments() -> argparse.Namespace:
                         
     parser.add_argument("--run-apt-mirror", action="store_true",
                         help="Run apt-mirror to start the initial mirror download")
+
+    parser.add_argument("--mirror-workers", dest="mirror_workers", type=int, default=16,
+                        help="Concurrent downloads for the initial mirror sync")
     
     parser.add_argument("--production", action="store_true",
                         help="Configure services to start at boot for production use")
@@ -152,31 +170,63 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--verbose", "-v", action="store_true",
                         help="Enable verbose output")
     
-    args = parser.parse_args()
-    
+    return parser
+
+
+# Parsed namespaces per argv; modules that each call the CLI entry get
+# the same Namespace back without rebuilding the parser or re-resolving
+# defaults
+_PARSED_CACHE: Dict[tuple, argparse.Namespace] = {}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command-line arguments (memoized per argv)"""
+    key = tuple(sys.argv[1:])
+    cached = _PARSED_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    args = _build_parser().parse_args()
+
     # Process and validate arguments
     args = _process_arguments(args)
-    
+
+    _PARSED_CACHE[key] = args
     return args
 
 
 def _process_arguments(args: argparse.Namespace) -> argparse.Namespace:
     """Process and validate parsed arguments"""
-    # Convert comma-separated values to lists
-    args.architectures = args.architectures.split(",")
-    args.entitlements = args.entitlements.split(",")
-    args.mirror_components = args.mirror_components.split(",")
-    args.mirror_pockets = args.mirror_pockets.split(",")
+    # A reconfigure run should not trust values resolved earlier in the
+    # process; drop the memoized results so they are looked up afresh
+    if args.reconfigure:
+        get_current_lts.cache_clear()
+        get_system_fqdn_or_ip.cache_clear()
+    
+    # Resolve expensive defaults only when the flags were not given, so
+    # --help and explicit invocations never fork subprocesses; both
+    # lookups are cached for the rest of the process
+    if getattr(args, "release", None) is None:
+        args.release = get_current_lts()
+    if getattr(args, "mirror_host", None) is None:
+        args.mirror_host = get_system_fqdn_or_ip()
+    
+    # Convert comma-separated values to lists, stripping whitespace in
+    # the same pass as the split
+    args.architectures = _CSV_RE.findall(args.architectures)
+    args.entitlements = _CSV_RE.findall(args.entitlements)
+    args.mirror_components = _CSV_RE.findall(args.mirror_components)
+    args.mirror_pockets = _CSV_RE.findall(args.mirror_pockets)
     
     if hasattr(args, 'build_types'):
-        args.build_types = args.build_types.split(",")
+        args.build_types = _CSV_RE.findall(args.build_types)
     
-    # Validate architectures
-    for arch in args.architectures:
-        if arch not in SUPPORTED_ARCHITECTURES and arch != "source":
-            logging.error(f"Unsupported architecture: {arch}")
-            logging.error(f"Supported architectures: {', '.join(SUPPORTED_ARCHITECTURES)} and 'source'")
-            sys.exit(1)
+    # Validate architectures with one set-difference pass
+    unsupported = set(args.architectures) - _SUPPORTED_ARCHITECTURE_SET - {"source"}
+    if unsupported:
+        logging.error(f"Unsupported architecture: {', '.join(sorted(unsupported))}")
+        logging.error(f"Supported architectures: {', '.join(SUPPORTED_ARCHITECTURES)} and 'source'")
+        sys.exit(1)
     
     # Add source if requested
     if args.include_source and "source" not in args.architectures:
@@ -184,10 +234,10 @@ def _process_arguments(args: argparse.Namespace) -> argparse.Namespace:
     
     # Validate build types if creating build map
     if args.create_build_map:
-        for build_type in args.build_types:
-            if build_type not in BUILD_TYPES:
-                logging.error(f"Unsupported build type: {build_type}")
-                logging.error(f"Supported build types: {', '.join(BUILD_TYPES)}")
-                sys.exit(1)
+        unsupported = set(args.build_types) - _BUILD_TYPE_SET
+        if unsupported:
+            logging.error(f"Unsupported build type: {', '.join(sorted(unsupported))}")
+            logging.error(f"Supported build types: {', '.join(BUILD_TYPES)}")
+            sys.exit(1)
     
     return args
@@ -7,6 +7,8 @@ import datetime
 import logging
 from typing import Dict, Any
 
+from pop.utils.system import atomic_write
+
 
 def setup_paths(args) -> Dict[str, str]:
     """
@@ -62,39 +64,41 @@ def save_configuration(args, paths) -> None:
     rc_file = paths["pop_rc_file"]
     
     try:
-        with open(rc_file, 'w') as f:
-            f.write(f"# PoP Configuration - Created {datetime.datetime.now().isoformat()}\n")
-            f.write(f"POP_TOKEN={args.token}\n")
-            f.write(f"POP_DIR={args.pop_dir}\n")
-            f.write(f"POP_RELEASE={args.release}\n")
-            f.write(f"POP_ARCHITECTURES={','.join(args.architectures)}\n")
-            f.write(f"POP_ENTITLEMENTS={','.join(args.entitlements)}\n")
-            f.write(f"POP_GPG_DIR={paths['pop_gpg_dir']}\n")
-            f.write(f"POP_JSON={paths['pop_json']}\n")
-            f.write(f"POP_RESOURCES_JSON={paths['pop_resources_json']}\n")
-            f.write(f"POP_APT_MIRROR_LIST={paths['pop_apt_mirror_list']}\n")
-            f.write(f"POP_APT_AUTH_FILE={paths['pop_apt_auth_file']}\n")
-            f.write(f"POP_LOG={paths['pop_log']}\n")
-            f.write(f"POP_OFFLINE_REPO={args.offline_repo}\n")
-            f.write(f"POP_MIRROR_HOST={args.mirror_host}\n")
-            f.write(f"POP_MIRROR_PORT={args.mirror_port}\n")
+        lines = [
+            f"# PoP Configuration - Created {datetime.datetime.now().isoformat()}\n",
+            f"POP_TOKEN={args.token}\n",
+            f"POP_DIR={args.pop_dir}\n",
+            f"POP_RELEASE={args.release}\n",
+            f"POP_ARCHITECTURES={','.join(args.architectures)}\n",
+            f"POP_ENTITLEMENTS={','.join(args.entitlements)}\n",
+            f"POP_GPG_DIR={paths['pop_gpg_dir']}\n",
+            f"POP_JSON={paths['pop_json']}\n",
+            f"POP_RESOURCES_JSON={paths['pop_resources_json']}\n",
+            f"POP_APT_MIRROR_LIST={paths['pop_apt_mirror_list']}\n",
+            f"POP_APT_AUTH_FILE={paths['pop_apt_auth_file']}\n",
+            f"POP_LOG={paths['pop_log']}\n",
+            f"POP_OFFLINE_REPO={args.offline_repo}\n",
+            f"POP_MIRROR_HOST={args.mirror_host}\n",
+            f"POP_MIRROR_PORT={args.mirror_port}\n",
+        ]
+        
+        # Add contract port if specified
+        if hasattr(args, 'contract_port'):
+            lines.append(f"POP_CONTRACT_PORT={args.contract_port}\n")
             
-            # Add contract port if specified
-            if hasattr(args, 'contract_port'):
-                f.write(f"POP_CONTRACT_PORT={args.contract_port}\n")
-                
-            # Add mirroring options if specified
-            if hasattr(args, 'mirror_standard_repos') and args.mirror_standard_repos:
-                f.write(f"POP_MIRROR_STANDARD_REPOS=True\n")
-                f.write(f"POP_MIRROR_COMPONENTS={','.join(args.mirror_components)}\n")
-                f.write(f"POP_MIRROR_POCKETS={','.join(args.mirror_pockets)}\n")
-                
-            # Add reconfigured timestamp if this is a reconfiguration
-            if getattr(args, 'reconfigure', False):
-                f.write(f"POP_RECONFIGURED={datetime.datetime.now().isoformat()}\n")
+        # Add mirroring options if specified
+        if hasattr(args, 'mirror_standard_repos') and args.mirror_standard_repos:
+            lines.append("POP_MIRROR_STANDARD_REPOS=True\n")
+            lines.append(f"POP_MIRROR_COMPONENTS={','.join(args.mirror_components)}\n")
+            lines.append(f"POP_MIRROR_POCKETS={','.join(args.mirror_pockets)}\n")
+            
+        # Add reconfigured timestamp if this is a reconfiguration
+        if getattr(args, 'reconfigure', False):
+            lines.append(f"POP_RECONFIGURED={datetime.datetime.now().isoformat()}\n")
         
-        # Secure permissions for token storage
-        os.chmod(rc_file, 0o600)
+        # One atomic publish: the token is written 0o600 from the start
+        # and a crash mid-write can never leave a truncated RC file
+        atomic_write(rc_file, "".join(lines).encode(), 0o600)
         logging.info(f"Configuration saved to {rc_file}")
     except Exception as e:
         logging.error(f"Failed to save configuration: {e}")
@@ -117,13 +121,19 @@ def load_configuration(rc_file: str) -> Dict[str, Any]:
             logging.warning(f"Configuration file {rc_file} not found")
             return config
             
+        # One read + splitlines; lines without '=' (or comments/blanks)
+        # are skipped instead of raising ValueError
         with open(rc_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    key, value = line.split('=', 1)
-                    config[key] = value
-                    
+            content = f.read()
+        config = {
+            key: value
+            for key, value in (
+                line.split('=', 1)
+                for line in map(str.strip, content.splitlines())
+                if line and not line.startswith('#') and '=' in line
+            )
+        }
+        
         logging.info(f"Configuration loaded from {rc_file}")
         return config
     except Exception as e:
@@ -7,6 +7,42 @@ import logging
 from typing import Dict
 
 from pop.core.contracts import map_entitlement_to_repo_path
+from pop.utils.system import atomic_write, cached_stat
+
+# Repository URLs for the known entitlement universe, precomputed so
+# the per-resource loop is a single dict lookup; unknown names fall
+# back to the esm-prefix mapping at runtime
+_ENT_REPO_URL = {
+    "anbox-cloud": "archive.anbox-cloud.io/stable/",
+    **{
+        name: f"esm.ubuntu.com/{map_entitlement_to_repo_path(name)}/ubuntu/"
+        for name in (
+            "esm-infra", "esm-apps", "infra", "apps",
+            "fips", "fips-updates", "fips-preview", "cis", "usg",
+        )
+    },
+}
+
+
+def _render_auth_body(resources: Dict[str, str]) -> bytes:
+    """
+    Render the auth file body for a resource-token mapping
+    
+    Args:
+        resources: Dictionary mapping entitlement types to resource tokens
+    
+    Returns:
+        Complete auth file contents as bytes
+    """
+    lines = []
+    for resource, password in resources.items():
+        # Known names hit the precomputed table; anything new still
+        # goes through the esm-infra -> infra mapping
+        repo_url = _ENT_REPO_URL.get(resource) or \
+            f"esm.ubuntu.com/{map_entitlement_to_repo_path(resource)}/ubuntu/"
+        
+        lines.append(f"machine {repo_url} login bearer password {password}  # ubuntu-pro-client\n")
+    return "".join(lines).encode()
 
 
 def create_auth_file(paths: Dict[str, str], resources: Dict[str, str]) -> None:
@@ -32,20 +68,13 @@ def create_auth_file(paths: Dict[str, str], resources: Dict[str, str]) -> None:
         # Ensure directory exists
         os.makedirs(os.path.dirname(auth_file_path), exist_ok=True)
         
-        with open(auth_file_path, 'w') as auth_file:
-            for resource, password in resources.items():
-                # Map the resource name (handles esm-infra -> infra conversion)
-                repo_path = map_entitlement_to_repo_path(resource)
-                
-                if repo_path == "anbox-cloud":
-                    repo_url = f"archive.anbox-cloud.io/stable/"
-                else:
-                    repo_url = f"esm.ubuntu.com/{repo_path}/ubuntu/"
-                
-                auth_file.write(f"machine {repo_url} login bearer password {password}  # ubuntu-pro-client\n")
+        # Build the whole body up front and publish it in one atomic
+        # 0o600 write, so the bearer tokens are never world-readable
+        # and a crash cannot leave a truncated auth file behind
+        atomic_write(auth_file_path, _render_auth_body(resources), 0o600)
         
-        # Set permissions
-        os.chmod(auth_file_path, 0o600)
+        # The file just changed; drop any memoized stat of the old one
+        cached_stat.cache_clear()
         logging.info(f"Auth file created at {auth_file_path}")
     except Exception as e:
         logging.error(f"Failed to create auth file: {e}")
@@ -64,12 +93,13 @@ def verify_auth_file(paths: Dict[str, str]) -> bool:
     """
     auth_file_path = paths["pop_apt_auth_file"]
     
-    if not os.path.exists(auth_file_path):
+    # One cached stat answers both the existence and permission checks
+    try:
+        file_perms = cached_stat(auth_file_path).st_mode & 0o777
+    except OSError:
         logging.warning(f"Authentication file does not exist: {auth_file_path}")
         return False
     
-    # Check permissions
-    file_perms = os.stat(auth_file_path).st_mode & 0o777
     if file_perms != 0o600:
         logging.warning(f"Authentication file has incorrect permissions: {oct(file_perms)}")
         return False
@@ -81,6 +111,10 @@ def update_auth_file(paths: Dict[str, str], resources: Dict[str, str]) -> None:
     """
     Update authentication file with new resource tokens
     
+    The new body is rendered first and compared against what is on
+    disk; when nothing changed (the common reconfigure case) the file
+    is left untouched, preserving its mtime for rsync-style workflows.
+    
     Args:
         paths: Dictionary of system paths
         resources: Dictionary mapping entitlement types to resource tokens
@@ -88,6 +122,16 @@ def update_auth_file(paths: Dict[str, str], resources: Dict[str, str]) -> None:
     Returns:
         None
     """
-    # The simplest way to update is to recreate the file
+    auth_file_path = paths["pop_apt_auth_file"]
+    body = _render_auth_body(resources)
+    
+    try:
+        with open(auth_file_path, 'rb') as auth_file:
+            if auth_file.read() == body:
+                logging.info("Authentication file already up to date")
+                return
+    except OSError:
+        pass
+    
     create_auth_file(paths, resources)
     logging.info("Authentication file updated")
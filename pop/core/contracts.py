@@ -2,108 +2,165 @@
 Contract data management for Ubuntu Pro on Premises (PoP)
 """
 
+import functools
 import json
 import logging
-import tempfile
 import subprocess
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, List
 
-from pop.utils.system import run_command
+import yaml
 
 
 def pull_contract_data(token: str, paths: Dict[str, str]) -> Dict[str, Any]:
     """
     Pull contract data using pro-airgapped
-    
+
+    The token is fed to pro-airgapped over a pipe and its YAML output is
+    parsed in process, so no shell, cat, or yq processes are forked and
+    the secret never touches the filesystem.
+
     Args:
         token: Ubuntu Pro contract token
         paths: Dictionary of system paths
-        
+
     Returns:
         Dictionary containing contract data
-        
+
     Raises:
         SystemExit: If contract data retrieval fails
     """
     logging.info("Pulling contract data with pro-airgapped")
-    
+
     try:
-        # Create a temporary file for the token
-        with tempfile.NamedTemporaryFile(mode='w+') as token_file:
-            token_file.write(f"{token}:")
-            token_file.flush()
-            
-            # Run pro-airgapped and pipe to yq for JSON output
-            command = f"cat {token_file.name} | /usr/bin/pro-airgapped | yq -o=json"
-            result = run_command(["sh", "-c", command], capture_output=True, shell=True)
-            
-            # Save the contract data
-            with open(paths["pop_json"], 'w') as json_file:
-                json_file.write(result)
-            
-            logging.info(f"Contract data saved to {paths['pop_json']}")
-            return json.loads(result)
+        process = subprocess.Popen(
+            ["/usr/bin/pro-airgapped"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        output, errors = process.communicate(f"{token}:")
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, "pro-airgapped", output=output, stderr=errors
+            )
+
+        contract_data = yaml.safe_load(output)
+
+        # Save the contract data
+        with open(paths["pop_json"], 'w') as json_file:
+            json.dump(contract_data, json_file, indent=4)
+
+        logging.info(f"Contract data saved to {paths['pop_json']}")
+        return contract_data
     except Exception as e:
         logging.error(f"Failed to pull contract data: {e}")
         raise
 
 
+@dataclass
+class ParsedContract:
+    """Account info, entitlements, and GPG keys from one contract walk"""
+    account: Dict[str, str] = field(default_factory=lambda: {
+        "name": "Unknown",
+        "id": "Unknown",
+        "created_at": "Unknown",
+        "effective_from": "Unknown",
+        "effective_to": "Unknown",
+    })
+    entitlements: List[Dict[str, Any]] = field(default_factory=list)
+    gpg_keys: Dict[str, str] = field(default_factory=dict)
+
+
+def parse_contract(contract_data: Dict[str, Any]) -> ParsedContract:
+    """
+    Extract account info, entitlements, and GPG keys in a single pass
+
+    The account, entitlement, and key consumers each need a walk over
+    contractInfo -> resourceEntitlements; fusing them means one
+    traversal of the contract dict instead of three.
+
+    Args:
+        contract_data: Contract data as returned by pull_contract_data
+
+    Returns:
+        ParsedContract with the extracted pieces
+    """
+    parsed = ParsedContract()
+
+    first = True
+    for token, info in contract_data.items():
+        contract_info = info.get("contractInfo", {})
+
+        # Account details come from the first contract entry
+        if first:
+            parsed.account = {
+                "name": contract_info.get("name", "Unknown"),
+                "id": contract_info.get("id", "Unknown"),
+                "created_at": contract_info.get("createdAt", "Unknown"),
+                "effective_from": contract_info.get("effectiveFrom", "Unknown"),
+                "effective_to": contract_info.get("effectiveTo", "Unknown"),
+            }
+            first = False
+
+        for entitlement in contract_info.get("resourceEntitlements", []):
+            directives = entitlement.get("directives", {})
+            ent_type = entitlement.get("type")
+            parsed.entitlements.append({
+                "type": ent_type or "Unknown",
+                "entitled": entitlement.get("entitled", False),
+                "suites": directives.get("suites", []),
+            })
+
+            apt_key = directives.get("aptKey")
+            if ent_type and apt_key:
+                parsed.gpg_keys[ent_type] = apt_key
+
+    return parsed
+
+
 def extract_account_info(contract_data: Dict[str, Any]) -> Dict[str, str]:
     """
     Extract account information from contract data
-    
+
+    Thin wrapper over parse_contract for callers that only need the
+    account block.
+
     Args:
         contract_data: Contract data as returned by pull_contract_data
-        
+
     Returns:
         Dictionary containing account information
     """
-    for token, info in contract_data.items():
-        contract_info = info.get("contractInfo", {})
-        return {
-            "name": contract_info.get("name", "Unknown"),
-            "id": contract_info.get("id", "Unknown"),
-            "created_at": contract_info.get("createdAt", "Unknown"),
-            "effective_from": contract_info.get("effectiveFrom", "Unknown"),
-            "effective_to": contract_info.get("effectiveTo", "Unknown"),
-        }
-    return {
-        "name": "Unknown",
-        "id": "Unknown",
-        "created_at": "Unknown",
-        "effective_from": "Unknown",
-        "effective_to": "Unknown",
-    }
+    return parse_contract(contract_data).account
 
 
 def extract_entitlements(contract_data: Dict[str, Any]) -> list:
     """
     Extract entitlements from contract data
-    
+
+    Thin wrapper over parse_contract for callers that only need the
+    entitlement list.
+
     Args:
         contract_data: Contract data as returned by pull_contract_data
-        
+
     Returns:
         List of dictionaries containing entitlement information
     """
-    entitlements = []
-    for token, info in contract_data.items():
-        contract_info = info.get("contractInfo", {})
-        for entitlement in contract_info.get("resourceEntitlements", []):
-            entitlements.append({
-                "type": entitlement.get("type", "Unknown"),
-                "entitled": entitlement.get("entitled", False),
-                "suites": entitlement.get("directives", {}).get("suites", []),
-            })
-    return entitlements
+    return parse_contract(contract_data).entitlements
 
 
+@functools.lru_cache(maxsize=64)
 def map_entitlement_to_repo_path(entitlement_name: str) -> str:
     """
     Map API entitlement names to actual repository paths
     
     Handles the discrepancy between get-resource-token's
-    "esm-infra" naming and actual repository paths like "infra"
+    "esm-infra" naming and actual repository paths like "infra".
+    Memoized: the mapping is pure and hot loops in the estimator and
+    mirror-list generation call it once per entitlement per target.
     
     Args:
         entitlement_name: Entitlement name from API
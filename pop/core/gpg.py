@@ -3,62 +3,147 @@ GPG key management for Ubuntu Pro on Premises (PoP)
 """
 
 import os
+import importlib.resources
 import logging
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
-from pop.utils.system import run_command
+import requests
+
+from pop.core.contracts import parse_contract
+from pop.utils.system import atomic_write, cached_stat
+
+
+def _fetch_and_dearmor(session: requests.Session, key_url: str, key_path: str) -> None:
+    """
+    Download one armored key and dearmor it into key_path
+
+    Args:
+        session: Shared HTTP session (reuses the keyserver connection)
+        key_url: Keyserver lookup URL
+        key_path: Destination keyring path
+    """
+    response = session.get(key_url, timeout=30)
+    response.raise_for_status()
+
+    # Dearmor in one subprocess fed over stdin -- no shell, no wget
+    process = subprocess.run(
+        ["gpg", "--dearmor"],
+        input=response.content,
+        stdout=subprocess.PIPE,
+        check=True
+    )
+
+    # Atomic rename so apt never sees a half-written keyring
+    atomic_write(key_path, process.stdout, 0o644)
+
+
+def _bundled_key(ent_type: str):
+    """
+    Return the bundled keyring resource for an entitlement, or None
+
+    Args:
+        ent_type: Entitlement type (e.g. 'esm-infra')
+
+    Returns:
+        A traversable resource if pop.data.keys ships the keyring,
+        otherwise None
+    """
+    try:
+        src = importlib.resources.files("pop.data.keys") \
+            .joinpath(f"ubuntu-{ent_type}.gpg")
+        if src.is_file():
+            return src
+    except (ImportError, AttributeError):
+        # importlib.resources.files needs 3.9+; older interpreters just
+        # use the network path
+        pass
+    return None
 
 
 def download_gpg_keys(paths: Dict[str, str], contract_data: Dict[str, Any]) -> None:
     """
     Download GPG keys for repositories
-    
+
+    Keyrings bundled under pop.data.keys are copied straight into
+    place, so the common path needs no DNS, TLS, or keyserver at all --
+    which also keeps air-gapped installs deterministic. Only missing
+    keys are fetched, in parallel over one persistent HTTP session, and
+    dearmored via gpg reading from stdin.
+
     Args:
         paths: Dictionary of system paths
         contract_data: Contract data from contracts.py
-        
+
     Returns:
         None
-        
+
     Raises:
         Exception: If key download fails
     """
     logging.info("Downloading GPG keys for repositories")
-    
+
     try:
         # Create GPG directory if it doesn't exist
         os.makedirs(paths["pop_gpg_dir"], exist_ok=True)
-        
-        # Extract GPG keys
-        gpg_keys = {}
-        for token, info in contract_data.items():
-            for entitlement in info.get("contractInfo", {}).get("resourceEntitlements", []):
-                ent_type = entitlement.get("type")
-                apt_key = entitlement.get("directives", {}).get("aptKey")
-                
-                if ent_type and apt_key:
-                    gpg_keys[ent_type] = apt_key
-        
-        # Download keys
+
+        # Extract GPG keys via the shared single-pass contract walk
+        gpg_keys = parse_contract(contract_data).gpg_keys
+
+        # Satisfy what we can from the bundled keyrings first
+        remaining = {}
+        present = 0
         for ent_type, key_id in gpg_keys.items():
-            key_name = f"ubuntu-{ent_type}.gpg"
-            key_path = os.path.join(paths["pop_gpg_dir"], key_name)
-            key_url = f"https://keyserver.ubuntu.com/pks/lookup?op=get&search=0x{key_id}"
-            
-            # Download and convert key
-            logging.info(f"Downloading GPG key for {ent_type}")
-            run_command(
-                ["sh", "-c", f"wget -qO- '{key_url}' | gpg --dearmor > '{key_path}'"],
-                shell=True
-            )
-            
-            # Set appropriate permissions
-            os.chmod(key_path, 0o644)
-            
-            logging.info(f"Downloaded GPG key for {ent_type} to {key_path}")
-        
-        logging.info(f"Downloaded {len(gpg_keys)} GPG keys")
+            key_path = os.path.join(paths["pop_gpg_dir"], f"ubuntu-{ent_type}.gpg")
+
+            # Reconfigure runs already have the keyrings on disk; a
+            # non-empty file is kept rather than re-fetched
+            try:
+                if os.path.getsize(key_path) > 0:
+                    logging.info(f"GPG key for {ent_type} already present, skipping")
+                    present += 1
+                    continue
+            except OSError:
+                pass
+
+            src = _bundled_key(ent_type)
+            if src is not None:
+                with importlib.resources.as_file(src) as src_path:
+                    shutil.copyfile(src_path, key_path)
+                os.chmod(key_path, 0o644)
+                logging.info(f"Installed bundled GPG key for {ent_type}")
+            else:
+                remaining[ent_type] = key_id
+
+        # Download the rest in parallel over a shared session
+        if remaining:
+            session = requests.Session()
+            with ThreadPoolExecutor(max_workers=min(len(remaining), 8)) as executor:
+                futures = {}
+                for ent_type, key_id in remaining.items():
+                    key_name = f"ubuntu-{ent_type}.gpg"
+                    key_path = os.path.join(paths["pop_gpg_dir"], key_name)
+                    key_url = f"https://keyserver.ubuntu.com/pks/lookup?op=get&search=0x{key_id}"
+
+                    logging.info(f"Downloading GPG key for {ent_type}")
+                    future = executor.submit(_fetch_and_dearmor, session,
+                                             key_url, key_path)
+                    futures[future] = (ent_type, key_path)
+
+                for future, (ent_type, key_path) in futures.items():
+                    future.result()
+                    logging.info(f"Downloaded GPG key for {ent_type} to {key_path}")
+
+        # Keyrings changed on disk; invalidate memoized stats
+        if gpg_keys:
+            cached_stat.cache_clear()
+
+        logging.info(f"Installed {len(gpg_keys)} GPG keys "
+                     f"({present} already present, "
+                     f"{len(gpg_keys) - present - len(remaining)} bundled, "
+                     f"{len(remaining)} downloaded)")
     except Exception as e:
         logging.error(f"Failed to download GPG keys: {e}")
         raise
@@ -81,7 +166,9 @@ def verify_gpg_keys(paths: Dict[str, str], entitlements: list) -> bool:
         key_name = f"ubuntu-{entitlement}.gpg"
         key_path = os.path.join(paths["pop_gpg_dir"], key_name)
         
-        if not os.path.exists(key_path):
+        try:
+            cached_stat(key_path)
+        except OSError:
             missing.append(entitlement)
     
     if missing:
@@ -110,7 +197,8 @@ def add_keyring_to_apt(key_path: str) -> bool:
             if not os.path.exists(apt_trusted_dir):
                 os.makedirs(apt_trusted_dir, exist_ok=True)
                 
-            run_command(["cp", "-f", key_path, target_path])
+            # shutil.copyfile uses in-kernel copy on Linux; no /bin/cp fork
+            shutil.copyfile(key_path, target_path)
             os.chmod(target_path, 0o644)
             
             logging.info(f"Added keyring to apt: {target_path}")
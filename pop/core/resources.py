@@ -7,6 +7,8 @@ import logging
 import subprocess
 from typing import Dict, Any
 
+import yaml
+
 from pop.utils.system import run_command
 
 
@@ -33,24 +35,15 @@ def generate_resource_tokens(token: str, paths: Dict[str, str]) -> Dict[str, str
             capture_output=True
         )
         
-        # Parse the output
-        output_lines = result.strip().split('\n')
-        
-        resources = {}
-        resource_section_started = False
-        
-        for line in output_lines:
-            if "resources:" in line:
-                resource_section_started = True
-                continue
-                
-            if resource_section_started and ":" in line and not line.startswith(("server:", "account:")):
-                parts = line.strip().split(':', 1)
-                if len(parts) == 2 and "contracts.canonical.com" not in line:
-                    key = parts[0].strip()
-                    value = parts[1].strip()
-                    resources[key] = value
-        
+        # The tool emits YAML; one safe_load replaces the line-by-line
+        # state machine and is robust to formatting changes
+        document = yaml.safe_load(result) or {}
+        resources = {
+            key: str(value)
+            for key, value in (document.get("resources") or {}).items()
+            if "contracts.canonical.com" not in str(value)
+        }
+
         # Save to JSON file
         with open(paths["pop_resources_json"], 'w') as json_file:
             json.dump(resources, json_file, indent=4)
@@ -94,16 +87,18 @@ def validate_entitlements(resources: Dict[str, str], requested_entitlements: lis
     Returns:
         True if all requested entitlements are available, False otherwise
     """
+    # One set materialization makes the membership checks O(1) per
+    # entitlement instead of scanning the dict keys twice per entry
+    resource_keys = set(resources)
     missing = []
     
     for entitlement in requested_entitlements:
         # Handle esm-infra -> infra mapping
-        entitlement_key = entitlement
-        if not entitlement.startswith("esm-") and f"esm-{entitlement}" in resources:
-            entitlement_key = f"esm-{entitlement}"
-            
-        if entitlement not in resources and entitlement_key not in resources:
-            missing.append(entitlement)
+        if entitlement in resource_keys:
+            continue
+        if not entitlement.startswith("esm-") and f"esm-{entitlement}" in resource_keys:
+            continue
+        missing.append(entitlement)
     
     if missing:
         logging.warning(f"Missing entitlements: {', '.join(missing)}")
@@ -0,0 +1,3 @@
+"""
+Bundled package data for Ubuntu Pro on Premises (PoP)
+"""
@@ -0,0 +1,8 @@
+"""
+Bundled GPG keyrings for Ubuntu Pro repositories
+
+Pre-dearmored keyrings named ubuntu-<entitlement>.gpg placed in this
+directory are used instead of contacting the keyserver, keeping
+air-gapped installs fully offline. Entitlements without a bundled
+keyring fall back to the keyserver lookup.
+"""
@@ -6,6 +6,7 @@ import os
 import sys
 import logging
 import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Import modules
 from pop.config.args import parse_arguments
@@ -40,69 +41,129 @@ def display_banner():
     print(banner)
 
 
+def _flag(args, name):
+    """
+    Read an optional boolean argument without the hasattr dance
+
+    argparse sets most of these attributes unconditionally, so one
+    getattr with a default replaces the hasattr-plus-access pair.
+
+    Args:
+        args: Parsed argument namespace
+        name: Attribute name to read
+
+    Returns:
+        The attribute value, or False when unset
+    """
+    return getattr(args, name, False)
+
+
 def display_completion_message(args, paths, is_reconfiguring, size_info=None, apt_mirror_result=None):
     """Display completion message"""
     mode = "Reconfiguration" if is_reconfiguring else "Configuration"
-    
-    completion_message = f"""
-    ┌───────────────────────────────────────────────┐
-    │ PoP {mode.lower()} complete!                       │
-    │                                               │
-    │ Configuration: {paths['pop_rc_file']}
-    │ Mirror List:   {paths['pop_apt_mirror_list']}
-    │ Auth File:     {paths['pop_apt_auth_file']}
-    """
-    
-    if hasattr(args, 'create_build_map') and args.create_build_map:
-        completion_message += f"""│                                               │
-    │ Build files:   {paths['pop_builds_dir']}
-    """
-    
-    if hasattr(args, 'generate_web_ui') and args.generate_web_ui and not is_reconfiguring:
-        completion_message += f"""│                                               │
-    │ Web UI:        http://{args.mirror_host}/
-    """
-    
-    if hasattr(args, 'configure_snap_proxy') and args.configure_snap_proxy and not is_reconfiguring:
-        completion_message += f"""│                                               │
-    │ Snap Proxy:    http://{args.mirror_host}:8000/
-    """
-    
+
+    # Collect lines and join once; repeated += on large f-strings
+    # reallocates the whole message every time
+    spacer = "    │                                               │"
+    lines = [
+        "",
+        "    ┌───────────────────────────────────────────────┐",
+        f"    │ PoP {mode.lower()} complete!                       │",
+        spacer,
+        f"    │ Configuration: {paths['pop_rc_file']}",
+        f"    │ Mirror List:   {paths['pop_apt_mirror_list']}",
+        f"    │ Auth File:     {paths['pop_apt_auth_file']}",
+    ]
+
+    if _flag(args, 'create_build_map'):
+        lines += [spacer,
+                  f"    │ Build files:   {paths['pop_builds_dir']}"]
+
+    if _flag(args, 'generate_web_ui') and not is_reconfiguring:
+        lines += [spacer,
+                  f"    │ Web UI:        http://{args.mirror_host}/"]
+
+    if _flag(args, 'configure_snap_proxy') and not is_reconfiguring:
+        lines += [spacer,
+                  f"    │ Snap Proxy:    http://{args.mirror_host}:8000/"]
+
     if size_info:
-        completion_message += f"""│                                               │
-    │ Estimated Size: {size_info['readable']} ({size_info['packages']:,} packages)
-    """
-    
-    if hasattr(args, 'setup_apache') and args.setup_apache:
-        completion_message += f"""│                                               │
-    │ Repository URL: http://{args.mirror_host}/
-    """
-    
-    if hasattr(args, 'production') and args.production:
-        completion_message += f"""│                                               │
-    │ Services:      Configured to start at boot
-    │ Contracts:     systemctl status pop-contracts
-    │ Mirror Updates: systemctl status pop-mirror.timer
-    """
-    
+        lines += [spacer,
+                  f"    │ Estimated Size: {size_info['readable']} ({size_info['packages']:,} packages)"]
+
+    if _flag(args, 'setup_apache'):
+        lines += [spacer,
+                  f"    │ Repository URL: http://{args.mirror_host}/"]
+
+    if _flag(args, 'production'):
+        lines += [spacer,
+                  "    │ Services:      Configured to start at boot",
+                  "    │ Contracts:     systemctl status pop-contracts",
+                  "    │ Mirror Updates: systemctl status pop-mirror.timer"]
+
     if apt_mirror_result is not None:
         status = "successful" if apt_mirror_result else "failed"
-        completion_message += f"""│                                               │
-    │ Initial mirror: {status}
-    """
-    
+        lines += [spacer,
+                  f"    │ Initial mirror: {status}"]
+
     next_steps = "Run apt-mirror to update packages" if is_reconfiguring else "Run apt-mirror to download packages"
-    if hasattr(args, 'run_apt_mirror') and args.run_apt_mirror:
+    if _flag(args, 'run_apt_mirror'):
         next_steps = "Repository mirroring completed"
-    
-    completion_message += f"""│                                               │
-    │ Next Steps:                                   │
-    │ 1. {next_steps}        │
-    │ 2. Configure clients to use this repository   │
-    └───────────────────────────────────────────────┘
+
+    lines += [
+        spacer,
+        "    │ Next Steps:                                   │",
+        f"    │ 1. {next_steps}        │",
+        "    │ 2. Configure clients to use this repository   │",
+        "    └───────────────────────────────────────────────┘",
+        "",
+    ]
+
+    print("\n".join(lines))
+
+
+def _run_stages(stages, max_workers=8):
     """
-    
-    print(completion_message)
+    Run named setup stages as a dependency DAG over a thread pool
+
+    Each stage is (name, callable, dependency names). A stage is
+    submitted as soon as every dependency has finished, so independent
+    I/O-bound stages overlap and the wall time shrinks to the longest
+    dependency chain instead of the sum of all stages. Dependencies on
+    stages not scheduled this run are ignored.
+
+    Args:
+        stages: List of (name, fn, deps) tuples
+        max_workers: Thread pool size
+
+    Returns:
+        Dictionary mapping stage name to its return value
+    """
+    pending = {name: (fn, set(deps)) for name, fn, deps in stages}
+    for fn, deps in pending.values():
+        deps.intersection_update(pending)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+
+        def submit_ready():
+            for name in list(pending):
+                fn, deps = pending[name]
+                if deps <= results.keys():
+                    futures[executor.submit(fn)] = name
+                    del pending[name]
+
+        submit_ready()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                results[name] = future.result()
+                logging.debug(f"Setup stage complete: {name}")
+            submit_ready()
+
+    return results
 
 
 def main():
@@ -129,7 +190,7 @@ def main():
     logging.info(f"Using mirror host: {args.mirror_host}")
     
     # Check if reconfiguring
-    is_reconfiguring = args.reconfigure if hasattr(args, 'reconfigure') else False
+    is_reconfiguring = _flag(args, 'reconfigure')
     if is_reconfiguring:
         if not os.path.exists(paths["pop_dir"]):
             logging.error(f"Cannot reconfigure: {paths['pop_dir']} does not exist")
@@ -145,16 +206,27 @@ def main():
         install_prerequisites(args.offline_repo)
         download_pro_packages(paths)
     
-    # Always pull new contract data
-    contract_data = pull_contract_data(args.token, paths)
-    resources = generate_resource_tokens(args.token, paths)
+    # Always pull new contract data; the contract pull and resource
+    # token generation are independent subprocess-bound steps, so they
+    # run concurrently and the wall time is the longer of the two
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        contract_future = executor.submit(pull_contract_data, args.token, paths)
+        resources_future = executor.submit(generate_resource_tokens, args.token, paths)
+        contract_data = contract_future.result()
+        resources = resources_future.result()
     create_auth_file(paths, resources)
-    download_gpg_keys(paths, contract_data)
-    
-    # Estimate mirror size if requested
+
+    # Estimate mirror size if requested. The GPG key download shares
+    # nothing with the estimate beyond contract data, so it starts now
+    # and is joined by its stage below; wall time for this phase is
+    # max(estimate, keys) instead of their sum
     size_info = None
-    if hasattr(args, 'estimate_size') and args.estimate_size:
-        size_info = estimate_mirror_size(paths, resources, args.release, 
+    gpg_future = None
+    if _flag(args, 'estimate_size'):
+        estimate_pool = ThreadPoolExecutor(max_workers=1)
+        gpg_future = estimate_pool.submit(download_gpg_keys, paths, contract_data)
+        estimate_pool.shutdown(wait=False)
+        size_info = estimate_mirror_size(paths, resources, args.release,
                                         args.architectures, args.entitlements)
         print("\nMirror Size Estimate:")
         print(f"  Total size:      {size_info['readable']}")
@@ -169,68 +241,88 @@ def main():
             sys.exit(0)
     
     # Create mirror list with mirror host if specified
-    mirror_components = args.mirror_components if hasattr(args, 'mirror_components') else None
-    mirror_pockets = args.mirror_pockets if hasattr(args, 'mirror_pockets') else None
-    mirror_standard_repos = args.mirror_standard_repos if hasattr(args, 'mirror_standard_repos') else False
-    
-    create_mirror_list(
-        paths, resources, args.release, args.architectures, args.entitlements, 
-        args.mirror_host, args.mirror_port, mirror_standard_repos, 
-        mirror_components, mirror_pockets
-    )
-    
+    mirror_components = getattr(args, 'mirror_components', None)
+    mirror_pockets = getattr(args, 'mirror_pockets', None)
+    mirror_standard_repos = _flag(args, 'mirror_standard_repos')
+
+    # The setup stages below hit disparate endpoints and files and are
+    # mutually independent except where deps say otherwise, so they run
+    # as a DAG over a thread pool; serial chains with true data
+    # dependencies (contract -> tokens -> auth file) already ran above
+    stages = [
+        ("gpg-keys", (gpg_future.result if gpg_future is not None
+                      else lambda: download_gpg_keys(paths, contract_data)), []),
+        ("mirror-list", lambda: create_mirror_list(
+            paths, resources, args.release, args.architectures, args.entitlements,
+            args.mirror_host, args.mirror_port, mirror_standard_repos,
+            mirror_components, mirror_pockets
+        ), []),
+    ]
+
+    has_tls = bool(getattr(args, 'tls_cert', None) and getattr(args, 'tls_key', None))
+
     # Configure snap-proxy if requested and not reconfiguring
-    if hasattr(args, 'configure_snap_proxy') and args.configure_snap_proxy and not is_reconfiguring:
-        configure_snap_proxy(paths, args.token)
-    
+    if _flag(args, 'configure_snap_proxy') and not is_reconfiguring:
+        stages.append(("snap-proxy",
+                       lambda: configure_snap_proxy(paths, args.token), []))
+
     # Configure TLS if certificates provided
-    if hasattr(args, 'tls_cert') and args.tls_cert and hasattr(args, 'tls_key') and args.tls_key:
-        configure_tls_certificates(paths, args.tls_cert, args.tls_key)
-    
-    # Configure Apache if requested
-    if hasattr(args, 'setup_apache') and args.setup_apache:
-        setup_apache_for_mirror(paths, args.mirror_host)
-    
+    if has_tls:
+        stages.append(("tls", lambda: configure_tls_certificates(
+            paths, args.tls_cert, args.tls_key), []))
+
+    # Configure Apache if requested; the vhost may reference the TLS
+    # certificates, so it waits for that stage when present
+    if _flag(args, 'setup_apache'):
+        stages.append(("apache", lambda: setup_apache_for_mirror(
+            paths, args.mirror_host), ["tls"]))
+
     # Configure Nginx if web UI is requested
-    if hasattr(args, 'generate_web_ui') and args.generate_web_ui:
-        configure_nginx(paths, args.mirror_host)
-    
+    if _flag(args, 'generate_web_ui'):
+        stages.append(("nginx", lambda: configure_nginx(
+            paths, args.mirror_host), ["tls"]))
+
     # Configure cron job if requested
-    if hasattr(args, 'setup_cron') and args.setup_cron:
-        cron_schedule = args.cron_schedule if hasattr(args, 'cron_schedule') else "0 */12 * * *"
-        setup_cron_for_mirror(paths, cron_schedule)
-    
+    if _flag(args, 'setup_cron'):
+        cron_schedule = getattr(args, 'cron_schedule', "0 */12 * * *")
+        stages.append(("cron",
+                       lambda: setup_cron_for_mirror(paths, cron_schedule), []))
+
+    _run_stages(stages)
+
     # Save configuration
     save_configuration(args, paths)
     
     # Create build map if requested
-    if hasattr(args, 'create_build_map') and args.create_build_map:
-        build_types = args.build_types if hasattr(args, 'build_types') else ["vm", "container", "snap"]
+    if _flag(args, 'create_build_map'):
+        build_types = getattr(args, 'build_types', ["vm", "container", "snap"])
         create_build_templates(paths, resources, args.release, args.architectures, build_types)
     
     # Generate web UI if requested and not reconfiguring
-    if hasattr(args, 'generate_web_ui') and args.generate_web_ui and not is_reconfiguring:
+    if _flag(args, 'generate_web_ui') and not is_reconfiguring:
         generate_web_ui(paths, resources, contract_data, args.release, args.architectures)
     
     # Configure production services if requested
-    if hasattr(args, 'production') and args.production:
+    if _flag(args, 'production'):
         # Determine which servers to enable
         server_types = []
-        if hasattr(args, 'setup_apache') and args.setup_apache:
+        if _flag(args, 'setup_apache'):
             server_types.append("apache")
-        if hasattr(args, 'generate_web_ui') and args.generate_web_ui:
+        if _flag(args, 'generate_web_ui'):
             server_types.append("nginx")
             
         # Get contract port if specified
-        contract_port = args.contract_port if hasattr(args, 'contract_port') else 8484
+        contract_port = getattr(args, 'contract_port', 8484)
         
         # Configure services
         configure_production_services(paths, contract_port, server_types)
     
     # Run apt-mirror if requested
     apt_mirror_result = None
-    if hasattr(args, 'run_apt_mirror') and args.run_apt_mirror:
-        apt_mirror_result = run_apt_mirror(paths)
+    if _flag(args, 'run_apt_mirror'):
+        apt_mirror_result = run_apt_mirror(
+            paths, max_workers=getattr(args, 'mirror_workers', 16)
+        )
     
     # Display completion message
     display_completion_message(args, paths, is_reconfiguring, size_info, apt_mirror_result)
@@ -0,0 +1,147 @@
+"""
+Low-level directory walker for large mirror trees
+
+os.scandir drives getdents64 through a libc-managed 32K buffer; for
+pool/ directories with millions of entries the syscall count dominates.
+This module issues getdents64 directly with a 256 KB buffer and parses
+struct linux_dirent64 itself, classifying entries from d_type so only
+regular files pay a stat (for st_size). Platforms where the syscall
+number is unknown fall back to the portable scandir walker.
+"""
+
+import ctypes
+import logging
+import os
+import platform
+import stat as stat_module
+import struct
+from typing import Tuple
+
+from pop.utils.statx import fast_stat_at
+from pop.utils.system import walk_stats
+
+# getdents64 syscall numbers per architecture; anything absent here
+# uses the scandir fallback
+_SYS_GETDENTS64 = {
+    "x86_64": 217,
+    "aarch64": 61,
+    "riscv64": 61,
+    "s390x": 220,
+    "ppc64le": 202,
+}.get(platform.machine())
+
+_BUFFER_SIZE = 256 * 1024
+
+# d_type values from dirent.h
+_DT_UNKNOWN = 0
+_DT_DIR = 4
+_DT_REG = 8
+
+# struct linux_dirent64 layout: u64 d_ino, s64 d_off, u16 d_reclen,
+# u8 d_type, then the NUL-terminated name; native byte order, since
+# the kernel fills the buffer (s390x is big-endian)
+_HEADER = struct.Struct("=QqHB")
+
+_libc = None
+if _SYS_GETDENTS64 is not None and os.name == "posix":
+    try:
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.syscall.restype = ctypes.c_long
+    except OSError:
+        _libc = None
+
+
+def _getdents_walk(root: str) -> Tuple[int, int, int]:
+    """
+    Walk a tree with raw getdents64 calls
+
+    Args:
+        root: Directory to walk
+
+    Returns:
+        Tuple of (total bytes, file count, directory count)
+    """
+    total_size = 0
+    file_count = 0
+    dir_count = 0
+    buffer = ctypes.create_string_buffer(_BUFFER_SIZE)
+    stack = [root]
+
+    while stack:
+        path = stack.pop()
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        except OSError:
+            continue
+        try:
+            while True:
+                nread = _libc.syscall(
+                    ctypes.c_long(_SYS_GETDENTS64),
+                    ctypes.c_uint(fd), buffer, ctypes.c_uint(_BUFFER_SIZE)
+                )
+                if nread <= 0:
+                    break
+                data = buffer.raw
+                offset = 0
+                while offset < nread:
+                    _, _, reclen, d_type = _HEADER.unpack_from(data, offset)
+                    name_end = data.index(b"\0", offset + _HEADER.size)
+                    name = data[offset + _HEADER.size:name_end]
+                    offset += reclen
+
+                    if name in (b".", b".."):
+                        continue
+
+                    if d_type == _DT_UNKNOWN:
+                        # Filesystem did not fill d_type; classify with
+                        # one stat relative to the open directory
+                        try:
+                            entry_stat = os.stat(name, dir_fd=fd,
+                                                 follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if stat_module.S_ISDIR(entry_stat.st_mode):
+                            d_type = _DT_DIR
+                        elif stat_module.S_ISREG(entry_stat.st_mode):
+                            file_count += 1
+                            total_size += entry_stat.st_size
+                            continue
+                        else:
+                            continue
+
+                    if d_type == _DT_DIR:
+                        dir_count += 1
+                        stack.append(os.path.join(path, os.fsdecode(name)))
+                    elif d_type == _DT_REG:
+                        file_count += 1
+                        try:
+                            # statx with DONT_SYNC requests only the
+                            # size field from the kernel cache
+                            total_size += fast_stat_at(fd, name).size
+                        except OSError:
+                            file_count -= 1
+        finally:
+            os.close(fd)
+
+    return total_size, file_count, dir_count
+
+
+def count_and_size(root: str) -> Tuple[int, int, int]:
+    """
+    Collect total size, file count, and directory count for a tree
+
+    Uses the raw getdents64 walker where the syscall is known for this
+    architecture, otherwise the portable scandir walker.
+
+    Args:
+        root: Directory to walk
+
+    Returns:
+        Tuple of (total bytes, file count, directory count)
+    """
+    if _libc is not None:
+        try:
+            return _getdents_walk(root)
+        except Exception as e:
+            logging.debug(f"getdents64 walker failed, using scandir: {e}")
+    return walk_stats(root)
@@ -4,12 +4,102 @@ apt-mirror configuration for Ubuntu Pro on Premises (PoP)
 
 import os
 import re
+import copy
+import grp
+import pwd
+import time
 import logging
 import subprocess
 import datetime
+from collections import deque
 from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
 
-from pop.utils.system import run_command
+from pop.mirror._fastwalk import count_and_size
+from pop.utils.system import humanize_size, run_command
+
+
+# Patterns for scraping statistics out of apt-mirror's output,
+# compiled once at import
+_DOWNLOAD_SIZE_RE = re.compile(r'([0-9.]+) ([KMG]iB) will be downloaded into archive')
+_PKG_COUNT_RE = re.compile(r'([0-9,]+) packages')
+_CLEANUP_RE = re.compile(r'([0-9.]+) ([KMG]iB)? in ([0-9,]+) files and ([0-9,]+) directories can be freed')
+
+# One alternation of the three patterns above, so a multi-megabyte
+# apt-mirror log is traversed once instead of once per pattern
+_STATS_RE = re.compile(
+    f'(?P<size>{_DOWNLOAD_SIZE_RE.pattern})'
+    f'|(?P<clean>{_CLEANUP_RE.pattern})'
+    f'|(?P<pkgs>{_PKG_COUNT_RE.pattern})'
+)
+
+# How many trailing log lines run_apt_mirror_command keeps for its
+# result dictionary; the full log is not buffered
+_OUTPUT_TAIL_LINES = 200
+
+# Mirror stats cache: path -> (wall time, tree mtime, stats). A full
+# walk over a multi-TB mirror can take minutes; back-to-back callers
+# within the TTL get the cached result for the cost of one stat
+_STATS_TTL = 300
+_STATS_CACHE: Dict[str, tuple] = {}
+
+
+def invalidate_mirror_stats() -> None:
+    """Flush cached mirror statistics after the tree has changed"""
+    _STATS_CACHE.clear()
+
+
+def _chown_tree_if_needed(root: str, user: str, group: str) -> int:
+    """
+    Recursively chown a tree, touching only entries with wrong ownership
+    
+    chown -R re-chowns every inode on every run; on an idempotent
+    re-run over a populated mirror that is millions of pointless
+    metadata writes. This walk only issues lchown for entries whose
+    uid/gid actually differ. A sentinel file short-circuits the whole
+    walk when nothing changed since the last pass.
+    
+    Args:
+        root: Directory tree to fix up
+        user: Target owner name
+        group: Target group name
+    
+    Returns:
+        Number of entries that were changed
+    """
+    uid = pwd.getpwnam(user).pw_uid
+    gid = grp.getgrnam(group).gr_gid
+    
+    sentinel = os.path.join(root, ".pop-chowned-v1")
+    try:
+        if os.lstat(sentinel).st_mtime >= os.lstat(root).st_mtime:
+            return 0
+    except OSError:
+        pass
+    
+    changed = 0
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        if st.st_uid != uid or st.st_gid != gid:
+            os.lchown(path, uid, gid)
+            changed += 1
+        if not os.path.isdir(path) or os.path.islink(path):
+            continue
+        try:
+            with os.scandir(path) as entries:
+                stack.extend(entry.path for entry in entries)
+        except OSError:
+            continue
+    
+    with open(sentinel, 'w'):
+        pass
+    os.lchown(sentinel, uid, gid)
+    return changed
 
 
 def configure_apt_mirror(paths: Dict[str, str]) -> bool:
@@ -35,8 +125,11 @@ def configure_apt_mirror(paths: Dict[str, str]) -> bool:
         for directory in mirror_dirs:
             os.makedirs(directory, exist_ok=True)
         
-        # Set correct permissions
-        run_command(["chown", "-R", "apt-mirror:apt-mirror", "/var/spool/apt-mirror"])
+        # Set correct permissions, skipping entries already owned
+        changed = _chown_tree_if_needed("/var/spool/apt-mirror",
+                                        "apt-mirror", "apt-mirror")
+        if changed:
+            logging.info(f"Fixed ownership of {changed} mirror entries")
         
         # Create symlink to mirror list if it doesn't exist
         apt_mirror_conf = "/etc/apt/mirror.list"
@@ -54,15 +147,59 @@ def configure_apt_mirror(paths: Dict[str, str]) -> bool:
         return False
 
 
-def run_apt_mirror_command(mirror_list_path: Optional[str] = None, 
+def _scrape_stats(output: str, result: Dict[str, Any]) -> None:
+    """
+    Scrape download and cleanup statistics from apt-mirror output
+
+    One finditer pass over the combined alternation visits the log
+    once; each hit is re-matched against its own small pattern to pull
+    the groups out without index arithmetic across the alternation.
+
+    Args:
+        output: apt-mirror output (possibly just one line)
+        result: Result dictionary to fill in place
+    """
+    for match in _STATS_RE.finditer(output):
+        kind = match.lastgroup
+        text = match.group(kind)
+
+        if kind == "size":
+            size_match = _DOWNLOAD_SIZE_RE.match(text)
+            size = f"{size_match.group(1)} {size_match.group(2)}"
+            result["download_size"] = size
+            logging.info(f"Downloaded {size} of packages")
+        elif kind == "pkgs":
+            count_match = _PKG_COUNT_RE.match(text)
+            result["download_count"] = int(count_match.group(1).replace(',', ''))
+        elif kind == "clean":
+            cleanup_match = _CLEANUP_RE.match(text)
+            cleanup_size = f"{cleanup_match.group(1)} {cleanup_match.group(2) or 'bytes'}"
+            cleanup_files = cleanup_match.group(3).replace(',', '')
+            cleanup_dirs = cleanup_match.group(4).replace(',', '')
+
+            result["cleanup_size"] = cleanup_size
+            result["cleanup_files"] = int(cleanup_files)
+            result["cleanup_dirs"] = int(cleanup_dirs)
+
+            logging.info(f"{cleanup_size} in {cleanup_files} files and {cleanup_dirs} directories can be freed")
+            logging.info("Run /var/spool/apt-mirror/var/clean.sh to free space")
+
+
+def run_apt_mirror_command(mirror_list_path: Optional[str] = None,
                          verbose: bool = False) -> Dict[str, Any]:
     """
     Run apt-mirror command
-    
+
+    Output is streamed line by line, so statistics are logged in real
+    time and memory stays constant however large the log grows; only
+    a bounded tail of the log is kept in the result. stderr
+    is merged into the stream, so the 'error' key stays empty unless
+    the process itself cannot be started.
+
     Args:
         mirror_list_path: Path to mirror list file (default: use system default)
         verbose: Enable verbose output
-        
+
     Returns:
         Dictionary with execution results
     """
@@ -86,51 +223,35 @@ def run_apt_mirror_command(mirror_list_path: Optional[str] = None,
     }
     
     try:
-        # Run apt-mirror
-        process = subprocess.run(
-            command, 
-            capture_output=True,
+        # Run apt-mirror, line-buffered so each line arrives as soon
+        # as it is printed
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1,
             text=True
         )
-        
-        result["output"] = process.stdout
-        result["error"] = process.stderr
-        result["success"] = process.returncode == 0
-        
+
+        tail = deque(maxlen=_OUTPUT_TAIL_LINES)
+        with process.stdout:
+            for line in process.stdout:
+                # The stats patterns are all single-line, so matching
+                # per line costs nothing extra over one big scan
+                _scrape_stats(line, result)
+                tail.append(line)
+        returncode = process.wait()
+
+        result["output"] = "".join(tail)
+        result["success"] = returncode == 0
+
         if not result["success"]:
-            logging.error(f"apt-mirror failed with exit code {process.returncode}")
-            logging.error(result["error"])
+            logging.error(f"apt-mirror failed with exit code {returncode}")
+            logging.error(result["output"])
             return result
         
-        # Parse output for statistics
-        output = process.stdout
-        
-        # Look for download size
-        size_match = re.search(r'([0-9.]+) ([KMG]iB) will be downloaded into archive', output)
-        if size_match:
-            size = f"{size_match.group(1)} {size_match.group(2)}"
-            result["download_size"] = size
-            logging.info(f"Downloaded {size} of packages")
-        
-        # Look for download count
-        count_match = re.search(r'([0-9,]+) packages', output)
-        if count_match:
-            count = count_match.group(1).replace(',', '')
-            result["download_count"] = int(count)
-        
-        # Look for cleanup info
-        cleanup_match = re.search(r'([0-9.]+) ([KMG]iB)? in ([0-9,]+) files and ([0-9,]+) directories can be freed', output)
-        if cleanup_match:
-            cleanup_size = f"{cleanup_match.group(1)} {cleanup_match.group(2) or 'bytes'}"
-            cleanup_files = cleanup_match.group(3).replace(',', '')
-            cleanup_dirs = cleanup_match.group(4).replace(',', '')
-            
-            result["cleanup_size"] = cleanup_size
-            result["cleanup_files"] = int(cleanup_files)
-            result["cleanup_dirs"] = int(cleanup_dirs)
-            
-            logging.info(f"{cleanup_size} in {cleanup_files} files and {cleanup_dirs} directories can be freed")
-            logging.info("Run /var/spool/apt-mirror/var/clean.sh to free space")
+        # The mirror tree just changed; cached stats are stale
+        invalidate_mirror_stats()
         
         logging.info("apt-mirror completed successfully")
         return result
@@ -156,6 +277,7 @@ def run_apt_mirror_cleanup() -> bool:
     
     try:
         result = run_command([cleanup_script], capture_output=True)
+        invalidate_mirror_stats()
         logging.info("Cleanup completed successfully")
         logging.debug(result)
         return True
@@ -189,70 +311,126 @@ def get_mirror_stats() -> Dict[str, Any]:
         return stats
     
     try:
+        # Serve from cache while the tree mtime matches and the TTL
+        # has not expired
+        tree_mtime = os.path.getmtime(mirror_path)
+        cached = _STATS_CACHE.get(mirror_path)
+        if cached is not None:
+            cached_ts, cached_mtime, cached_stats = cached
+            if cached_mtime == tree_mtime and time.time() - cached_ts < _STATS_TTL:
+                return copy.deepcopy(cached_stats)
+        
         # Get last update time
         last_update = datetime.datetime.fromtimestamp(
-            os.path.getmtime(mirror_path)
+            tree_mtime
         ).strftime("%Y-%m-%d %H:%M:%S")
         stats["last_update"] = last_update
         
-        # Get total size
-        du_result = subprocess.check_output(
-            ["du", "-sb", mirror_path], 
-            text=True
-        ).strip().split()[0]
-        
-        total_size_bytes = int(du_result)
+        # One walk yields size and counts together; the getdents64
+        # walker classifies entries from d_type so only regular files
+        # pay a stat call
+        total_size_bytes, file_count, dir_count = count_and_size(mirror_path)
         stats["total_size_bytes"] = total_size_bytes
-        
-        # Make human readable
-        if total_size_bytes < 1024:
-            stats["total_size"] = f"{total_size_bytes} B"
-        elif total_size_bytes < 1024*1024:
-            stats["total_size"] = f"{total_size_bytes/1024:.2f} KB"
-        elif total_size_bytes < 1024*1024*1024:
-            stats["total_size"] = f"{total_size_bytes/1024/1024:.2f} MB"
-        else:
-            stats["total_size"] = f"{total_size_bytes/1024/1024/1024:.2f} GB"
-        
-        # Count files and directories
-        file_count = int(subprocess.check_output(
-            ["find", mirror_path, "-type", "f", "-not", "-path", "*/\.*", "|", "wc", "-l"],
-            shell=True,
-            text=True
-        ).strip())
         stats["total_files"] = file_count
-        
-        dir_count = int(subprocess.check_output(
-            ["find", mirror_path, "-type", "d", "-not", "-path", "*/\.*", "|", "wc", "-l"],
-            shell=True,
-            text=True
-        ).strip())
         stats["total_dirs"] = dir_count
         
-        # Get repositories
+        stats["total_size"] = humanize_size(total_size_bytes)
+        
+        # Get repositories from the top two directory levels only
         repos = []
-        for root, dirs, files in os.walk(mirror_path, topdown=True):
-            # Limit depth - only get top-level directories
-            if root.count(os.sep) - mirror_path.count(os.sep) > 1:
+        try:
+            with os.scandir(mirror_path) as top_entries:
+                level_one = [e for e in top_entries if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            level_one = []
+        for top in level_one:
+            if top.name not in ["dists", "pool"]:  # Skip common repo subdirs
+                repos.append({"name": top.name, "path": top.name})
+            try:
+                with os.scandir(top.path) as sub_entries:
+                    for sub in sub_entries:
+                        if sub.is_dir(follow_symlinks=False) and sub.name not in ["dists", "pool"]:
+                            repos.append({
+                                "name": sub.name,
+                                "path": f"{top.name}/{sub.name}",
+                            })
+            except OSError:
                 continue
-                
-            for dirname in dirs:
-                if dirname not in ["dists", "pool"]:  # Skip common repo subdirs
-                    repo_path = os.path.join(root, dirname)
-                    repos.append({
-                        "name": dirname,
-                        "path": repo_path.replace(mirror_path + "/", ""),
-                    })
                     
         stats["repositories"] = repos
         stats["status"] = "Available"
         
+        _STATS_CACHE[mirror_path] = (time.time(), tree_mtime, copy.deepcopy(stats))
         return stats
     except Exception as e:
         logging.error(f"Failed to get mirror statistics: {e}")
         return stats
 
 
+def _iter_deb_lines(mirror_list_path: str):
+    """
+    Yield deb/deb-src lines from a mirror list one at a time
+    
+    Args:
+        mirror_list_path: Path to mirror list file
+    
+    Yields:
+        Stripped deb and deb-src lines
+    """
+    with open(mirror_list_path, 'r') as mirror_list:
+        for line in mirror_list:
+            line = line.lstrip()
+            if line.startswith(("deb ", "deb-src ")):
+                yield line
+
+
+def quick_mirror_stats(mirror_path: str = "/var/spool/apt-mirror/mirror") -> Dict[str, Any]:
+    """
+    Get approximate mirror statistics without walking the tree
+    
+    Dashboard-style callers rarely need exact numbers. Filesystem
+    usage comes from one statvfs call, and the expected file count is
+    read from apt-mirror's own var/ALL manifest (its canonical
+    inventory of the mirror) when present -- both O(1) relative to the
+    tree size. Use get_mirror_stats for exact walked numbers.
+    
+    Args:
+        mirror_path: Path to mirror directory
+        
+    Returns:
+        Dictionary with approximate size and file-count information
+    """
+    stats = {
+        "status": "Not available",
+        "fs_used_bytes": 0,
+        "fs_used_readable": "0 B",
+        "expected_files": 0,
+    }
+    
+    if not os.path.exists(mirror_path):
+        return stats
+    
+    try:
+        fs = os.statvfs(mirror_path)
+        used = (fs.f_blocks - fs.f_bavail) * fs.f_frsize
+        stats["fs_used_bytes"] = used
+        stats["fs_used_readable"] = humanize_size(used)
+        
+        # apt-mirror writes its full expected file list to var/ALL
+        manifest = os.path.join(os.path.dirname(mirror_path), "var", "ALL")
+        try:
+            with open(manifest, 'rb') as manifest_file:
+                stats["expected_files"] = sum(1 for _ in manifest_file)
+        except OSError:
+            pass
+        
+        stats["status"] = "Available"
+        return stats
+    except OSError as e:
+        logging.error(f"Failed to get quick mirror statistics: {e}")
+        return stats
+
+
 def verify_mirror_contents(mirror_list_path: str) -> Dict[str, Any]:
     """
     Verify mirror contents against mirror list
@@ -273,43 +451,29 @@ def verify_mirror_contents(mirror_list_path: str) -> Dict[str, Any]:
     }
     
     try:
-        # Read mirror list
-        with open(mirror_list_path, 'r') as f:
-            mirror_list = f.read()
-        
-        # Extract repository URLs
-        repo_lines = []
-        for line in mirror_list.splitlines():
-            if line.startswith("deb ") or line.startswith("deb-src "):
-                repo_lines.append(line)
-        
-        result["total_repos"] = len(repo_lines)
-        
         # Get mirror stats
         stats = get_mirror_stats()
         
-        # Check if each repository exists
-        for repo_line in repo_lines:
+        # The mirror lays repositories out under their domain root, so
+        # one set of domain segments answers every lookup in O(1)
+        mirror_domains = {
+            repo["path"].split('/', 1)[0] for repo in stats["repositories"]
+        }
+        
+        # Check each repository in one streamed pass over the list;
+        # nothing is materialized beyond the current line
+        for repo_line in _iter_deb_lines(mirror_list_path):
+            result["total_repos"] += 1
             parts = repo_line.split()
             if len(parts) >= 3:
                 repo_url = parts[1]
                 
-                # Extract domain and path
-                if "://" in repo_url:
-                    domain = repo_url.split("://")[1].split("/")[0]
-                    path = "/".join(repo_url.split("://")[1].split("/")[1:])
-                else:
-                    domain = repo_url.split("/")[0]
-                    path = "/".join(repo_url.split("/")[1:])
-                
-                # Check if repository exists in mirror
-                repo_exists = False
-                for repo in stats["repositories"]:
-                    if domain in repo["path"]:
-                        repo_exists = True
-                        break
+                # urlsplit handles ports and userinfo; bare host/path
+                # strings have no scheme and fall back to the first
+                # path segment
+                domain = urlsplit(repo_url).hostname or repo_url.split("/")[0]
                 
-                if not repo_exists:
+                if domain not in mirror_domains:
                     result["missing_repos"].append(repo_url)
                 else:
                     result["available_repos"] += 1
@@ -2,13 +2,180 @@
 Mirror size estimation for Ubuntu Pro on Premises (PoP)
 """
 
-import io
+import os
+import re
 import gzip
+import json
+import time
+import hashlib
 import logging
+import threading
 import requests
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Tuple
 
-from pop.core.contracts import map_entitlement_to_repo_path
+from pop.mirror.targets import iter_mirror_targets
+from pop.utils.system import atomic_write, humanize_size
+
+# Contract blobs can run to several MB; orjson parses them several
+# times faster than stdlib json when it is available, and the stdlib
+# is a drop-in fallback otherwise
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _JSON_READ_MODE = 'rb'
+except ImportError:
+    _json_loads = json.loads
+    _JSON_READ_MODE = 'r'
+
+# Parallel index fetches are latency-bound; this bounds both the
+# thread pool and the HTTP connection pool
+_FETCH_WORKERS = 32
+
+# Decompress+scan is the compute-bound half of each fetch. Capping it
+# at the CPU count lets the extra network workers keep prefetching
+# into socket buffers without oversubscribing the CPU on parse
+_PARSE_SEM = threading.Semaphore(os.cpu_count() or 2)
+
+# Only two facts are needed per index: package count and total size.
+# Precompiled byte regexes let the C engine scan for them instead of
+# splitting every field of every stanza in Python
+_SIZE_RE = re.compile(rb'(?m)^Size:[ \t]*(\d+)')
+_PKG_RE = re.compile(rb'(?m)^Package:')
+_SCAN_CHUNK = 1 << 20
+
+# On-disk cache of per-index results; archive indexes change at most
+# daily, so a conditional GET answered with 304 (~1 kB) replaces
+# re-downloading tens of MB per index on repeat estimator runs
+_ESTIMATOR_CACHE_DIR = "/var/cache/pop/estimator"
+
+
+def _estimator_cache_path(url: str) -> str:
+    """Return the cache file path for one index URL"""
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return os.path.join(_ESTIMATOR_CACHE_DIR, f"{digest}.json")
+
+
+def _load_estimator_cache(url: str):
+    """
+    Load the cached result for an index URL
+    
+    Args:
+        url: Package index URL
+        
+    Returns:
+        Dict with etag, last_modified, size, and count, or None
+    """
+    try:
+        with open(_estimator_cache_path(url), _JSON_READ_MODE) as cache_file:
+            return _json_loads(cache_file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_estimator_cache(url: str, etag, last_modified, size: int, count: int) -> None:
+    """
+    Persist the result for an index URL atomically
+    
+    Args:
+        url: Package index URL
+        etag: ETag response header, if any
+        last_modified: Last-Modified response header, if any
+        size: Total package bytes in the index
+        count: Package count in the index
+    """
+    try:
+        os.makedirs(_ESTIMATOR_CACHE_DIR, exist_ok=True)
+        payload = json.dumps({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": size,
+            "count": count,
+        }).encode()
+        atomic_write(_estimator_cache_path(url), payload, 0o644)
+    except OSError as e:
+        logging.debug(f"Could not write estimator cache for {url}: {e}")
+
+
+def _fetch_and_parse(session: requests.Session, package_path: str,
+                     resource_token: str) -> Tuple[int, int]:
+    """
+    Fetch one package index and sum its package sizes
+    
+    Args:
+        session: Shared HTTP session with pooled connections
+        package_path: Full URL of the Packages.gz/Sources.gz index
+        resource_token: Bearer token for the repository
+        
+    Returns:
+        Tuple of (total bytes, package count) for the index; (0, 0) if
+        the index could not be fetched
+    """
+    try:
+        auth = requests.auth.HTTPBasicAuth('bearer', resource_token)
+        headers = {'User-Agent': 'PoP/1.0'}
+        
+        # Revalidate a cached result in one round-trip if we have one
+        cached = _load_estimator_cache(package_path)
+        if cached:
+            if cached.get("etag"):
+                headers['If-None-Match'] = cached["etag"]
+            if cached.get("last_modified"):
+                headers['If-Modified-Since'] = cached["last_modified"]
+        
+        # stream=True hands us the raw socket, so gzip inflate overlaps
+        # with the download and the index is never buffered whole
+        response = session.get(package_path, auth=auth, headers=headers,
+                               stream=True, timeout=30)
+        
+        if response.status_code == 304 and cached:
+            response.close()
+            logging.debug(f"Index unchanged (304), using cache for {package_path}")
+            return cached["size"], cached["count"]
+        
+        if response.status_code != 200:
+            response.close()
+            logging.debug(f"Could not access {package_path}: {response.status_code}")
+            return 0, 0
+        
+        repo_size = 0
+        repo_packages = 0
+        
+        # Scan megabyte-sized decompressed chunks with the precompiled
+        # regexes, carrying any partial trailing line into the next
+        # chunk so line anchors stay correct across boundaries
+        try:
+            with gzip.GzipFile(fileobj=response.raw) as gz:
+                tail = b""
+                while True:
+                    # The semaphore throttles only the CPU-bound
+                    # inflate+scan; the socket keeps receiving while a
+                    # worker waits here
+                    with _PARSE_SEM:
+                        chunk = gz.read(_SCAN_CHUNK)
+                        if not chunk:
+                            break
+                        data = tail + chunk
+                        cut = data.rfind(b"\n") + 1
+                        scan, tail = data[:cut], data[cut:]
+                        repo_size += sum(int(m.group(1)) for m in _SIZE_RE.finditer(scan))
+                        repo_packages += sum(1 for _ in _PKG_RE.finditer(scan))
+                with _PARSE_SEM:
+                    if tail:
+                        repo_size += sum(int(m.group(1)) for m in _SIZE_RE.finditer(tail))
+                        repo_packages += sum(1 for _ in _PKG_RE.finditer(tail))
+        finally:
+            response.close()
+        
+        _save_estimator_cache(package_path, response.headers.get('ETag'),
+                              response.headers.get('Last-Modified'),
+                              repo_size, repo_packages)
+        return repo_size, repo_packages
+    except Exception as e:
+        logging.debug(f"Error estimating size for {package_path}: {e}")
+        return 0, 0
 
 
 def estimate_mirror_size(paths: Dict[str, str], resources: Dict[str, str], 
@@ -31,118 +198,60 @@ def estimate_mirror_size(paths: Dict[str, str], resources: Dict[str, str],
     
     try:
         # Read contract data
-        import json
-        with open(paths["pop_json"], 'r') as file:
-            contract_data = json.load(file)
+        with open(paths["pop_json"], _JSON_READ_MODE) as file:
+            contract_data = _json_loads(file.read())
         
         total_size = 0
         total_packages = 0
         
-        # Track repos that will be included
+        # Track repos that will be included and the index fetches to
+        # run, deduplicated by index URL
         included_repos = []
+        fetches = {}
         
-        # Process entitlements
-        for token, info in contract_data.items():
-            for entitlement in info.get("contractInfo", {}).get("resourceEntitlements", []):
-                ent_type = entitlement.get("type")
-                apt_url = entitlement.get("directives", {}).get("aptURL")
-                suites = entitlement.get("directives", {}).get("suites", [])
-                entitled = entitlement.get("entitled", False)
-                
-                # Map the entitlement name (handles esm-infra -> infra conversion)
-                repo_path = map_entitlement_to_repo_path(ent_type)
-                
-                # Skip if not entitled, missing URL, or not in our entitlements list
-                if not entitled or not apt_url or repo_path not in entitlements_list:
-                    continue
-                
-                # Get token for this entitlement
-                resource_token = resources.get(ent_type)
-                if not resource_token:
-                    logging.warning(f"No token found for entitlement {ent_type}")
-                    continue
-                
-                # Ensure URL format
-                if repo_path == "anbox-cloud":
-                    if not apt_url.endswith('/'):
-                        apt_url += "/"
-                else:
-                    if not apt_url.endswith('/ubuntu/'):
-                        if apt_url.endswith('/'):
-                            apt_url += "ubuntu/"
-                        else:
-                            apt_url += "/ubuntu/"
-                
-                # Process each suite (release) that matches our target
-                for suite in suites:
-                    if release in suite:
-                        # For each architecture
-                        for arch in architectures:
-                            if arch == "source":
-                                # Source packages format
-                                package_path = f"{apt_url}dists/{suite}/main/source/Sources.gz"
-                                included_repos.append(f"deb-src {apt_url} {suite} main")
-                            else:
-                                # Binary packages format
-                                package_path = f"{apt_url}dists/{suite}/main/binary-{arch}/Packages.gz"
-                                included_repos.append(f"deb [arch={arch}] {apt_url} {suite} main")
-                            
-                            try:
-                                # Set up authentication for requests
-                                auth = requests.auth.HTTPBasicAuth('bearer', resource_token)
-                                headers = {'User-Agent': 'PoP/1.0'}
-                                
-                                # Get the package list
-                                response = requests.get(package_path, auth=auth, headers=headers, timeout=30)
-                                
-                                if response.status_code == 200:
-                                    # Decompress gzip data
-                                    with gzip.GzipFile(fileobj=io.BytesIO(response.content)) as f:
-                                        package_data = f.read().decode('utf-8')
-                                    
-                                    # Parse package data to get size information
-                                    packages = []
-                                    current_package = {}
-                                    
-                                    for line in package_data.splitlines():
-                                        if not line.strip():
-                                            if current_package:
-                                                packages.append(current_package)
-                                                current_package = {}
-                                            continue
-                                        
-                                        if ':' in line:
-                                            key, value = line.split(':', 1)
-                                            current_package[key.strip()] = value.strip()
-                                    
-                                    # Add the last package if present
-                                    if current_package:
-                                        packages.append(current_package)
-                                    
-                                    # Sum up sizes
-                                    repo_size = sum(int(pkg.get('Size', 0)) for pkg in packages)
-                                    repo_packages = len(packages)
-                                    
-                                    total_size += repo_size
-                                    total_packages += repo_packages
-                                    
-                                    logging.debug(f"Found {repo_packages} packages ({repo_size/1024/1024:.2f} MB) in {suite}/{arch}")
-                                else:
-                                    logging.debug(f"Could not access {package_path}: {response.status_code}")
-                            except Exception as e:
-                                logging.debug(f"Error estimating size for {package_path}: {e}")
-        
-        # Convert to human-readable size
-        if total_size < 1024*1024:
-            readable_size = f"{total_size/1024:.2f} KB"
-        elif total_size < 1024*1024*1024:
-            readable_size = f"{total_size/1024/1024:.2f} MB"
-        else:
-            readable_size = f"{total_size/1024/1024/1024:.2f} GB"
+        # One shared traversal selects every (repo, suite, arch)
+        # combination; overlapping entitlements can yield the same
+        # index URL more than once, so fetches are keyed by URL and
+        # each unique index is downloaded and parsed exactly once
+        for target in iter_mirror_targets(contract_data, resources, release,
+                                          architectures, entitlements_list):
+            if target.arch == "source":
+                # Source packages format
+                package_path = f"{target.apt_url}dists/{target.suite}/main/source/Sources.gz"
+                repo_line = f"deb-src {target.apt_url} {target.suite} main"
+            else:
+                # Binary packages format
+                package_path = f"{target.apt_url}dists/{target.suite}/main/binary-{target.arch}/Packages.gz"
+                repo_line = f"deb [arch={target.arch}] {target.apt_url} {target.suite} main"
+            
+            if repo_line not in included_repos:
+                included_repos.append(repo_line)
+            # Any valid token authenticates the shared index
+            fetches.setdefault(package_path, target.token)
+        
+        # Fetch all indexes concurrently over one pooled session; the
+        # work is dominated by round trips, so wall time approaches the
+        # slowest single fetch instead of the sum of all of them
+        if fetches:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_FETCH_WORKERS,
+                                  pool_maxsize=_FETCH_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            
+            with ThreadPoolExecutor(max_workers=min(len(fetches), _FETCH_WORKERS)) as executor:
+                futures = [
+                    executor.submit(_fetch_and_parse, session, package_path, resource_token)
+                    for package_path, resource_token in fetches.items()
+                ]
+                for future in as_completed(futures):
+                    repo_size, repo_packages = future.result()
+                    total_size += repo_size
+                    total_packages += repo_packages
         
         return {
             "bytes": total_size,
-            "readable": readable_size,
+            "readable": humanize_size(total_size),
             "packages": total_packages,
             "included_repos": included_repos
         }
@@ -167,7 +276,10 @@ def get_mirror_disk_usage(mirror_path: str = "/var/spool/apt-mirror/mirror") ->
         Dictionary with disk usage information
     """
     import os
-    import subprocess
+    
+    from pop.mirror.apt_mirror import _STATS_CACHE, _STATS_TTL
+    from pop.mirror._fastwalk import count_and_size
+    from pop.utils.system import humanize_size
     
     stats = {
         "total_size_bytes": 0,
@@ -180,40 +292,25 @@ def get_mirror_disk_usage(mirror_path: str = "/var/spool/apt-mirror/mirror") ->
         return stats
         
     try:
-        # Get total size
-        du_result = subprocess.check_output(
-            ["du", "-sb", mirror_path], 
-            text=True
-        ).strip().split()[0]
-        
-        stats["total_size_bytes"] = int(du_result)
-        
-        # Make human readable
-        size_bytes = stats["total_size_bytes"]
-        if size_bytes < 1024:
-            stats["total_size_readable"] = f"{size_bytes} B"
-        elif size_bytes < 1024*1024:
-            stats["total_size_readable"] = f"{size_bytes/1024:.2f} KB"
-        elif size_bytes < 1024*1024*1024:
-            stats["total_size_readable"] = f"{size_bytes/1024/1024:.2f} MB"
-        else:
-            stats["total_size_readable"] = f"{size_bytes/1024/1024/1024:.2f} GB"
-            
-        # Count files and directories
-        file_count = subprocess.check_output(
-            ["find", mirror_path, "-type", "f", "|", "wc", "-l"],
-            shell=True,
-            text=True
-        ).strip()
-        stats["total_files"] = int(file_count)
-        
-        dir_count = subprocess.check_output(
-            ["find", mirror_path, "-type", "d", "|", "wc", "-l"],
-            shell=True,
-            text=True
-        ).strip()
-        stats["total_dirs"] = int(dir_count)
+        # Shares the TTL + mtime cache with get_mirror_stats (keyed
+        # separately per function so the shapes never mix)
+        cache_key = f"disk-usage:{mirror_path}"
+        tree_mtime = os.path.getmtime(mirror_path)
+        cached = _STATS_CACHE.get(cache_key)
+        if cached is not None:
+            cached_ts, cached_mtime, cached_stats = cached
+            if cached_mtime == tree_mtime and time.time() - cached_ts < _STATS_TTL:
+                return dict(cached_stats)
+        
+        # One low-level walk replaces the du fork and find pipelines
+        size_bytes, file_count, dir_count = count_and_size(mirror_path)
+        stats["total_size_bytes"] = size_bytes
+        stats["total_files"] = file_count
+        stats["total_dirs"] = dir_count
+        
+        stats["total_size_readable"] = humanize_size(size_bytes)
         
+        _STATS_CACHE[cache_key] = (time.time(), tree_mtime, dict(stats))
         return stats
     except Exception as e:
         logging.error(f"Failed to get mirror disk usage: {e}")
@@ -0,0 +1,479 @@
+"""
+Parallel in-process mirror downloader for Ubuntu Pro on Premises (PoP)
+
+apt-mirror fetches packages one at a time from a serial Perl loop, and
+the mirror run is network-bound, so wall-clock time scales with the
+connection count. This module parses the generated apt-mirror list
+itself, pulls the Packages indices, and downloads the referenced pool
+files over a pool of persistent HTTP connections in parallel, verifying
+SHA256 inline as each file streams to disk. The on-disk layout matches
+apt-mirror's (mirror/<host>/<path>/...) so the web server configuration
+and statistics code are unaffected.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pop.mirror.apt_mirror import invalidate_mirror_stats
+from pop.utils.system import humanize_size
+
+# Default number of concurrent downloads; tunable via --mirror-workers
+DEFAULT_WORKERS = 16
+
+# Cap concurrent connections per host so archive servers do not start
+# rate-limiting or redirecting us
+_PER_HOST_LIMIT = 20
+
+# Connection pool size for the shared session
+_POOL_SIZE = 32
+
+# Streaming chunk size for package downloads
+_CHUNK_SIZE = 64 * 1024
+
+# set directives from the apt-mirror config header
+_SET_RE = re.compile(r'^set\s+(\S+)\s+(\S+)', re.MULTILINE)
+
+# Cache rows are flushed in batches so one transaction amortizes the
+# fsync cost across many inserts
+_CACHE_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class PackageFile:
+    """One pool file to download, with its expected size and checksum"""
+    url: str
+    dest: str
+    size: int
+    sha256: str
+
+
+def _parse_set_directives(content: str) -> Dict[str, str]:
+    """
+    Parse the set directives from an apt-mirror list
+
+    Resolves $base_path references the way apt-mirror does so the
+    mirror_path setting is usable directly.
+
+    Args:
+        content: Full text of the apt-mirror list
+
+    Returns:
+        Dictionary of directive name to resolved value
+    """
+    settings = {"base_path": "/var/spool/apt-mirror"}
+    for key, value in _SET_RE.findall(content):
+        settings[key] = value.replace("$base_path", settings["base_path"])
+    settings.setdefault("mirror_path", f"{settings['base_path']}/mirror")
+    return settings
+
+
+def _parse_deb_lines(content: str, default_arch: str) -> Iterator[Tuple[str, str, List[str], List[str]]]:
+    """
+    Parse deb lines from an apt-mirror list
+
+    deb-src lines are skipped with a warning; source mirroring still
+    requires apt-mirror.
+
+    Args:
+        content: Full text of the apt-mirror list
+        default_arch: Architecture for deb lines without an arch option
+
+    Yields:
+        Tuples of (repo_url, suite, components, architectures)
+    """
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("deb-src "):
+            logging.warning(f"Skipping source entry (not supported by the "
+                            f"parallel downloader): {line.split()[1]}")
+            continue
+        if not line.startswith("deb "):
+            continue
+
+        parts = line.split()[1:]
+        arches = [default_arch]
+        if parts and parts[0].startswith("[arch="):
+            arches = parts[0][len("[arch="):].rstrip("]").split(",")
+            parts = parts[1:]
+        if len(parts) < 3:
+            logging.warning(f"Skipping malformed deb line: {line}")
+            continue
+
+        repo_url, suite, components = parts[0], parts[1], parts[2:]
+        if not repo_url.endswith("/"):
+            repo_url += "/"
+        yield repo_url, suite, components, arches
+
+
+def _local_path(mirror_root: str, url: str) -> str:
+    """
+    Map a repository URL to its path under the mirror root
+
+    Credentials embedded in the URL are dropped so the on-disk layout
+    matches what apt-mirror produces (mirror/<host>/<path>).
+
+    Args:
+        mirror_root: The mirror_path setting from the apt-mirror list
+        url: Full repository or file URL
+
+    Returns:
+        Absolute path below mirror_root
+    """
+    split = urlsplit(url)
+    return os.path.join(mirror_root, split.hostname or "unknown",
+                        split.path.lstrip("/"))
+
+
+def _parse_packages_index(data: bytes, repo_url: str,
+                          mirror_root: str) -> Iterator[PackageFile]:
+    """
+    Stream-parse a decompressed Packages index into download records
+
+    Args:
+        data: Decompressed Packages file contents
+        repo_url: Repository base URL the index belongs to
+        mirror_root: The mirror_path setting from the apt-mirror list
+
+    Yields:
+        PackageFile per package stanza with a Filename field
+    """
+    filename = size = sha256 = None
+    for line in data.split(b"\n"):
+        if line.startswith(b"Filename:"):
+            filename = line[len(b"Filename:"):].strip().decode()
+        elif line.startswith(b"Size:"):
+            size = int(line[len(b"Size:"):].strip())
+        elif line.startswith(b"SHA256:"):
+            sha256 = line[len(b"SHA256:"):].strip().decode()
+        elif not line:
+            if filename and size is not None:
+                url = f"{repo_url}{filename}"
+                yield PackageFile(url, _local_path(mirror_root, url),
+                                  size, sha256 or "")
+            filename = size = sha256 = None
+
+
+def _build_session() -> requests.Session:
+    """
+    Build a session with a connection pool sized for the worker count
+
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _open_sync_cache(var_path: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) the on-disk sync cache
+
+    The cache records the size, mtime, and checksum of every file the
+    downloader has verified, so warm reruns can skip a file on one
+    stat instead of re-hashing or re-fetching it.
+
+    Args:
+        var_path: The var_path setting from the apt-mirror list
+
+    Returns:
+        Open sqlite connection with the files table present
+    """
+    os.makedirs(var_path, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(var_path, "pop_sync.sqlite"))
+    # WAL keeps readers and the batched writer from blocking each other
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files "
+        "(url TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT)"
+    )
+    return conn
+
+
+def _load_sync_cache(conn: sqlite3.Connection) -> Dict[str, Tuple[int, float, str]]:
+    """
+    Load the whole sync cache into a dictionary
+
+    One SELECT up front is cheaper than a query per candidate file and
+    keeps the worker threads away from the connection.
+
+    Args:
+        conn: Open sync cache connection
+
+    Returns:
+        Dictionary of url to (size, mtime, sha256)
+    """
+    return {url: (size, mtime, sha256) for url, size, mtime, sha256
+            in conn.execute("SELECT url, size, mtime, sha256 FROM files")}
+
+
+def _flush_sync_cache(conn: sqlite3.Connection,
+                      records: List[Tuple[str, int, float, str]]) -> None:
+    """
+    Write verified file records to the sync cache in one transaction
+
+    Args:
+        conn: Open sync cache connection
+        records: (url, size, mtime, sha256) rows to upsert
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (url, size, mtime, sha256) "
+            "VALUES (?, ?, ?, ?)", records
+        )
+    records.clear()
+
+
+def _fetch_index(session: requests.Session, repo_url: str, suite: str,
+                 component: str, arch: str,
+                 mirror_root: str) -> List[PackageFile]:
+    """
+    Fetch one Packages.gz index and mirror it alongside its Release file
+
+    The decompressed index is parsed in memory; the compressed bytes are
+    written into the mirror tree so the repository is servable as-is.
+
+    Args:
+        session: Shared HTTP session
+        repo_url: Repository base URL (with credentials if any)
+        suite: Distribution suite (e.g. 'jammy-infra-security')
+        component: Repository component (e.g. 'main')
+        arch: Binary architecture (e.g. 'amd64')
+        mirror_root: The mirror_path setting from the apt-mirror list
+
+    Returns:
+        List of PackageFile records referenced by the index
+    """
+    index_rel = f"dists/{suite}/{component}/binary-{arch}/Packages.gz"
+    index_url = f"{repo_url}{index_rel}"
+
+    response = session.get(index_url, timeout=60)
+    response.raise_for_status()
+
+    # Keep a copy of the index in the mirror tree
+    index_path = _local_path(mirror_root, index_url)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, "wb") as f:
+        f.write(response.content)
+
+    data = gzip.decompress(response.content)
+    return list(_parse_packages_index(data, repo_url, mirror_root))
+
+
+def _fetch_release_files(session: requests.Session, repo_url: str, suite: str,
+                         mirror_root: str) -> None:
+    """
+    Mirror the suite-level Release metadata, best effort
+
+    Args:
+        session: Shared HTTP session
+        repo_url: Repository base URL
+        suite: Distribution suite
+        mirror_root: The mirror_path setting from the apt-mirror list
+    """
+    for name in ("Release", "Release.gpg", "InRelease"):
+        url = f"{repo_url}dists/{suite}/{name}"
+        try:
+            response = session.get(url, timeout=60)
+            if response.status_code != 200:
+                continue
+            path = _local_path(mirror_root, url)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(response.content)
+        except requests.RequestException as e:
+            logging.debug(f"Could not fetch {name} for {suite}: {e}")
+
+
+def _download_file(session: requests.Session, package: PackageFile,
+                   host_slots: threading.Semaphore) -> int:
+    """
+    Download one pool file with inline SHA256 verification
+
+    The file streams through a hash into a temp sibling and is renamed
+    into place only after the checksum matches, so a failed or partial
+    download never leaves a corrupt file in the mirror.
+
+    Args:
+        session: Shared HTTP session
+        package: File to download
+        host_slots: Per-host connection semaphore
+
+    Returns:
+        Bytes downloaded (0 if the file was already present)
+
+    Raises:
+        ValueError: If the downloaded file fails checksum or size checks
+    """
+    # apt-mirror skips files whose size already matches; do the same so
+    # resumed runs only pay for what is missing
+    try:
+        if os.path.getsize(package.dest) == package.size:
+            return 0
+    except OSError:
+        pass
+
+    os.makedirs(os.path.dirname(package.dest), exist_ok=True)
+    tmp_path = f"{package.dest}.tmp"
+    digest = hashlib.sha256()
+    written = 0
+
+    with host_slots:
+        with session.get(package.url, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+
+    if written != package.size:
+        os.unlink(tmp_path)
+        raise ValueError(f"Size mismatch for {package.dest}: "
+                         f"got {written}, expected {package.size}")
+    if package.sha256 and digest.hexdigest() != package.sha256:
+        os.unlink(tmp_path)
+        raise ValueError(f"SHA256 mismatch for {package.dest}")
+
+    os.replace(tmp_path, package.dest)
+    return written
+
+
+def run(paths: Dict[str, str],
+        max_workers: int = DEFAULT_WORKERS) -> Tuple[int, int, int]:
+    """
+    Mirror every repository in the apt-mirror list in parallel
+
+    Indices are fetched and parsed first, then the pool files are
+    downloaded over max_workers connections with a per-host cap of 20.
+    Files the sync cache has already verified are skipped on a single
+    stat, and files present at the expected size are not re-fetched, so
+    warm reruns cost seconds instead of a full re-scan.
+
+    Args:
+        paths: Dictionary of system paths
+        max_workers: Number of concurrent downloads
+
+    Returns:
+        Tuple of (files downloaded, bytes downloaded, failures)
+
+    Raises:
+        Exception: If the mirror list is missing or no index is reachable
+    """
+    with open(paths["pop_apt_mirror_list"], "r") as f:
+        content = f.read()
+
+    settings = _parse_set_directives(content)
+    mirror_root = settings["mirror_path"]
+    default_arch = settings.get("defaultarch", "amd64")
+
+    session = _build_session()
+
+    # Fetch all indices in parallel and flatten into one download list
+    packages: Dict[str, PackageFile] = {}
+    release_suites = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for repo_url, suite, components, arches in _parse_deb_lines(content, default_arch):
+            if (repo_url, suite) not in release_suites:
+                release_suites.add((repo_url, suite))
+                executor.submit(_fetch_release_files, session, repo_url,
+                                suite, mirror_root)
+            for component in components:
+                for arch in arches:
+                    future = executor.submit(_fetch_index, session, repo_url,
+                                             suite, component, arch, mirror_root)
+                    futures[future] = (suite, component, arch)
+
+        for future in as_completed(futures):
+            suite, component, arch = futures[future]
+            try:
+                for package in future.result():
+                    # Dedup by destination; suites often share pool files
+                    packages.setdefault(package.dest, package)
+            except Exception as e:
+                logging.warning(f"Failed to fetch index for {suite}/"
+                                f"{component}/{arch}: {e}")
+
+    logging.info(f"Resolved {len(packages)} package files across "
+                 f"{len(release_suites)} suites")
+
+    # Consult the sync cache: a file whose index entry matches the
+    # cached size+sha256 and whose on-disk stat matches the cached
+    # mtime+size needs no download and no re-hash
+    conn = _open_sync_cache(settings.get("var_path",
+                                         f"{settings['base_path']}/var"))
+    cached = _load_sync_cache(conn)
+    pending = []
+    cache_hits = 0
+    for package in packages.values():
+        entry = cached.get(package.url)
+        if entry and entry[0] == package.size and entry[2] == package.sha256:
+            try:
+                st = os.stat(package.dest)
+                if st.st_size == package.size and st.st_mtime == entry[1]:
+                    cache_hits += 1
+                    continue
+            except OSError:
+                pass
+        pending.append(package)
+
+    # Per-host semaphores keep any single archive below the rate limit
+    # while the pool stays saturated across hosts
+    host_slots = defaultdict(lambda: threading.Semaphore(_PER_HOST_LIMIT))
+
+    downloaded = 0
+    total_bytes = 0
+    failed = 0
+    records = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_download_file, session, package,
+                            host_slots[urlsplit(package.url).hostname]): package
+            for package in pending
+        }
+        for future in as_completed(futures):
+            package = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                failed += 1
+                logging.warning(f"Failed to download {package.url}: {e}")
+                continue
+            if written:
+                downloaded += 1
+                total_bytes += written
+            try:
+                records.append((package.url, package.size,
+                                os.stat(package.dest).st_mtime,
+                                package.sha256))
+            except OSError:
+                pass
+            if len(records) >= _CACHE_BATCH:
+                _flush_sync_cache(conn, records)
+
+    if records:
+        _flush_sync_cache(conn, records)
+    conn.close()
+
+    invalidate_mirror_stats()
+    logging.info(f"Downloaded {downloaded} files "
+                 f"({humanize_size(total_bytes)}), "
+                 f"{len(packages) - downloaded - failed} already present "
+                 f"({cache_hits} via sync cache), {failed} failed")
+    return downloaded, total_bytes, failed
@@ -8,6 +8,7 @@ import datetime
 from typing import Dict, List, Optional
 
 from pop.core.contracts import map_entitlement_to_repo_path
+from pop.utils.system import atomic_write
 
 
 def create_mirror_list(paths: Dict[str, str], resources: Dict[str, str], 
@@ -47,9 +48,9 @@ def create_mirror_list(paths: Dict[str, str], resources: Dict[str, str],
         # Create mirror list
         mirror_list_path = paths["pop_apt_mirror_list"]
         
-        with open(mirror_list_path, 'w') as mirror_file:
-            # Write header
-            header = f"""############# config ##################
+        # Collect every line first and publish the file in one atomic
+        # write below
+        header = f"""############# config ##################
 #
 # Created by PoP Configuration Script
 # {datetime.datetime.now().isoformat()}
@@ -67,101 +68,105 @@ set auth_no_challenge 1
 ############# end config ##############
 
 """
-            mirror_file.write(header)
+        parts = [header]
+        
+        # Loop invariants: these depend only on the architecture list
+        binary_archs = [a for a in architectures if a != 'source']
+        binary_archs_spec = ','.join(binary_archs)
+        has_source = 'source' in architectures
+        
+        # Track entitlements processed
+        processed_entitlements = set()
+        
+        # Process Ubuntu Pro entitlements
+        for resource_type, resource_token in resources.items():
+            # Map the entitlement name (handles esm-infra -> infra conversion)
+            repo_path = map_entitlement_to_repo_path(resource_type)
             
-            # Track entitlements processed
-            processed_entitlements = set()
+            # Skip if not in our entitlements list
+            if repo_path not in entitlements:
+                continue
             
-            # Process Ubuntu Pro entitlements
-            for resource_type, resource_token in resources.items():
-                # Map the entitlement name (handles esm-infra -> infra conversion)
-                repo_path = map_entitlement_to_repo_path(resource_type)
-                
-                # Skip if not in our entitlements list
-                if repo_path not in entitlements:
-                    continue
-                
-                # Determine repository URL
-                if repo_path == "anbox-cloud":
-                    apt_url = f"https://archive.anbox-cloud.io/stable/"
-                else:
-                    apt_url = f"https://esm.ubuntu.com/{repo_path}/ubuntu/"
-                
-                # Override URL with local mirror host if specified
-                if mirror_host:
-                    # Extract the path component from the URL
-                    url_parts = apt_url.split('/')
-                    # Rebuild URL with local mirror host
-                    if mirror_port and mirror_port != 80:
-                        apt_url = f"http://{mirror_host}:{mirror_port}/{'/'.join(url_parts[3:])}"
-                    else:
-                        apt_url = f"http://{mirror_host}/{'/'.join(url_parts[3:])}"
-                    logging.info(f"Using local mirror URL: {apt_url}")
-                
-                # Add credentials to URL
-                cred_url = apt_url.replace("https://", f"https://bearer:{resource_token}@")
-                cred_url = cred_url.replace("http://", f"http://bearer:{resource_token}@")
-                
-                # Add entry for release
-                repo_suite = f"{release}"
-                
-                # Handle source architecture differently
-                if 'source' in architectures:
-                    mirror_file.write(f"\ndeb-src {cred_url} {repo_suite} main\n")
-                
-                # Add binary architectures
-                binary_archs = [a for a in architectures if a != 'source']
-                if binary_archs:
-                    mirror_file.write(f"\ndeb [arch={','.join(binary_archs)}] {cred_url} {repo_suite} main\n")
-                
-                processed_entitlements.add(repo_path)
-                logging.info(f"Added repository for {repo_path} ({repo_suite})")
+            # Determine repository URL
+            if repo_path == "anbox-cloud":
+                apt_url = f"https://archive.anbox-cloud.io/stable/"
+            else:
+                apt_url = f"https://esm.ubuntu.com/{repo_path}/ubuntu/"
             
-            # Add clean directives for Pro repositories
-            for repo_path in processed_entitlements:
-                if repo_path == "anbox-cloud":
-                    mirror_file.write(f"\nclean https://archive.anbox-cloud.io/stable/\n")
+            # Override URL with local mirror host if specified
+            if mirror_host:
+                # Extract the path component from the URL
+                url_parts = apt_url.split('/')
+                # Rebuild URL with local mirror host
+                if mirror_port and mirror_port != 80:
+                    apt_url = f"http://{mirror_host}:{mirror_port}/{'/'.join(url_parts[3:])}"
                 else:
-                    mirror_file.write(f"\nclean https://esm.ubuntu.com/{repo_path}/ubuntu/\n")
+                    apt_url = f"http://{mirror_host}/{'/'.join(url_parts[3:])}"
+                logging.info(f"Using local mirror URL: {apt_url}")
+            
+            # Add credentials to URL in one scheme-aware substitution
+            scheme, rest = apt_url.split("://", 1)
+            cred_url = f"{scheme}://bearer:{resource_token}@{rest}"
+            
+            # Add entry for release
+            repo_suite = f"{release}"
+            
+            # Handle source architecture differently
+            if has_source:
+                parts.append(f"\ndeb-src {cred_url} {repo_suite} main\n")
+            
+            # Add binary architectures
+            if binary_archs:
+                parts.append(f"\ndeb [arch={binary_archs_spec}] {cred_url} {repo_suite} main\n")
+            
+            processed_entitlements.add(repo_path)
+            logging.info(f"Added repository for {repo_path} ({repo_suite})")
+        
+        # Add clean directives for Pro repositories
+        for repo_path in processed_entitlements:
+            if repo_path == "anbox-cloud":
+                parts.append(f"\nclean https://archive.anbox-cloud.io/stable/\n")
+            else:
+                parts.append(f"\nclean https://esm.ubuntu.com/{repo_path}/ubuntu/\n")
+        
+        # If requested, add standard Ubuntu repositories
+        if mirror_standard_repos and components and pockets:
+            logging.info(f"Adding standard Ubuntu repositories for {release}")
+            components_str = " ".join(components)
+            
+            # Determine if we need ports.ubuntu.com or archive.ubuntu.com
+            use_ports = any(arch in ['arm64', 'armhf', 'ppc64el', 's390x'] for arch in architectures)
+            repo_url = "http://ports.ubuntu.com/ubuntu-ports" if use_ports else "http://archive.ubuntu.com/ubuntu"
+            
+            # Map pocket names to Ubuntu repository names
+            pocket_map = {
+                "release": release,
+                "updates": f"{release}-updates",
+                "backports": f"{release}-backports",
+                "security": f"{release}-security"
+            }
+            
+            # Add entries for each pocket
+            for pocket in pockets:
+                if pocket in pocket_map:
+                    suite = pocket_map[pocket]
+                    
+                    # Add source if requested
+                    if has_source:
+                        parts.append(f"\ndeb-src {repo_url} {suite} {components_str}\n")
+                    
+                    # Add binary architectures
+                    for arch in binary_archs:
+                        parts.append(f"\ndeb [arch={arch}] {repo_url} {suite} {components_str}\n")
+                    
+                    logging.info(f"Added standard repository: {suite} with components: {components_str}")
             
-            # If requested, add standard Ubuntu repositories
-            if mirror_standard_repos and components and pockets:
-                logging.info(f"Adding standard Ubuntu repositories for {release}")
-                components_str = " ".join(components)
-                
-                # Determine if we need ports.ubuntu.com or archive.ubuntu.com
-                use_ports = any(arch in ['arm64', 'armhf', 'ppc64el', 's390x'] for arch in architectures)
-                repo_url = "http://ports.ubuntu.com/ubuntu-ports" if use_ports else "http://archive.ubuntu.com/ubuntu"
-                
-                # Map pocket names to Ubuntu repository names
-                pocket_map = {
-                    "release": release,
-                    "updates": f"{release}-updates",
-                    "backports": f"{release}-backports",
-                    "security": f"{release}-security"
-                }
-                
-                # Add entries for each pocket
-                for pocket in pockets:
-                    if pocket in pocket_map:
-                        suite = pocket_map[pocket]
-                        
-                        # Add source if requested
-                        if 'source' in architectures:
-                            mirror_file.write(f"\ndeb-src {repo_url} {suite} {components_str}\n")
-                        
-                        # Add binary architectures
-                        binary_archs = [a for a in architectures if a != 'source']
-                        for arch in binary_archs:
-                            mirror_file.write(f"\ndeb [arch={arch}] {repo_url} {suite} {components_str}\n")
-                        
-                        logging.info(f"Added standard repository: {suite} with components: {components_str}")
-                
-                # Add clean directive for standard repositories
-                mirror_file.write(f"\nclean {repo_url}\n")
+            # Add clean directive for standard repositories
+            parts.append(f"\nclean {repo_url}\n")
         
-        # Set permissions
-        os.chmod(mirror_list_path, 0o644)
+        # One write(2) via a temp sibling plus rename, so apt-mirror
+        # can never observe a half-written list
+        atomic_write(mirror_list_path, "".join(parts).encode(), 0o644)
         logging.info(f"Mirror list created at {mirror_list_path} with {len(processed_entitlements)} entitlements")
     except Exception as e:
         logging.error(f"Failed to create mirror list: {e}")
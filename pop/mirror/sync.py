@@ -2,66 +2,59 @@
 Mirror synchronization functionality for Ubuntu Pro on Premises (PoP)
 """
 
+import datetime
 import os
-import re
 import logging
-import subprocess
 from typing import Dict, Optional
 
-from pop.utils.system import run_command
+from pop.mirror import fast_sync
+from pop.mirror._fastwalk import count_and_size
+from pop.utils.system import humanize_size, run_command, try_stat
 
 
-def run_apt_mirror(paths: Dict[str, str]) -> bool:
+def run_apt_mirror(paths: Dict[str, str],
+                   max_workers: int = fast_sync.DEFAULT_WORKERS) -> bool:
     """
-    Run apt-mirror to start the initial mirror download
-    
+    Start the initial mirror download
+
+    Thin wrapper over the parallel in-process downloader, which replaces
+    the serial apt-mirror subprocess: the Perl loop fetched one file at
+    a time, while fast_sync pulls packages over a pool of persistent
+    connections and verifies checksums inline.
+
     Args:
         paths: Dictionary of system paths
-        
+        max_workers: Number of concurrent downloads
+
     Returns:
         True if successful, False otherwise
     """
-    logging.info("Running apt-mirror for initial repository download")
-    
+    logging.info("Running parallel mirror download")
+
     try:
-        # Run apt-mirror with the generated mirror list
-        result = run_command(
-            ["apt-mirror", paths["pop_apt_mirror_list"]],
-            capture_output=True
-        )
-        
-        # Extract information from output
-        output = result
-        
-        # Look for download size
-        size_match = re.search(r'([0-9.]+) ([KMG]iB) will be downloaded into archive', output)
-        if size_match:
-            size = f"{size_match.group(1)} {size_match.group(2)}"
-            logging.info(f"Downloaded {size} of packages")
-        
-        # Look for cleanup info
-        cleanup_match = re.search(r'([0-9.]+) ([KMG]iB)? in ([0-9]+) files and ([0-9]+) directories can be freed', output)
-        if cleanup_match:
-            cleanup_size = f"{cleanup_match.group(1)} {cleanup_match.group(2) or 'bytes'}"
-            cleanup_files = cleanup_match.group(3)
-            cleanup_dirs = cleanup_match.group(4)
-            logging.info(f"{cleanup_size} in {cleanup_files} files and {cleanup_dirs} directories can be freed")
-            logging.info("Run /var/spool/apt-mirror/var/clean.sh to free space")
-        
-        logging.info("apt-mirror completed successfully")
+        downloaded, total_bytes, failed = fast_sync.run(paths, max_workers)
+        if failed:
+            logging.error(f"Mirror download finished with {failed} failures")
+            return False
+        logging.info("Mirror download completed successfully")
         return True
     except Exception as e:
-        logging.error(f"Failed to run apt-mirror: {e}")
+        logging.error(f"Failed to run mirror download: {e}")
         return False
 
 
 def verify_mirror(paths: Dict[str, str]) -> Dict[str, str]:
     """
     Verify mirror structure and get statistics
-    
+
+    One in-process scandir-based walk replaces the stat, du, and
+    find | wc -l subprocesses: the walker reuses each entry's d_type
+    and stat result, so the tree is read once with no fork/exec and no
+    shell in the path.
+
     Args:
         paths: Dictionary of system paths
-        
+
     Returns:
         Dictionary with mirror statistics
     """
@@ -72,42 +65,21 @@ def verify_mirror(paths: Dict[str, str]) -> Dict[str, str]:
         "total_size": "0 GB",
         "total_files": "0"
     }
-    
-    if not os.path.exists(mirror_path):
+
+    try:
+        mirror_stat = os.stat(mirror_path)
+    except OSError:
         logging.warning(f"Mirror directory does not exist: {mirror_path}")
         return stats
-    
-    # Get last update time
-    try:
-        last_update = run_command(
-            ["stat", "-c", "%y", mirror_path], 
-            capture_output=True
-        )
-        stats["last_update"] = last_update.strip()
-    except:
-        pass
-        
-    # Get total size
-    try:
-        total_size = run_command(
-            ["du", "-sh", mirror_path], 
-            capture_output=True
-        ).split()[0]
-        stats["total_size"] = total_size
-    except:
-        pass
-        
-    # Get total files
-    try:
-        total_files = run_command(
-            ["find", mirror_path, "-type", "f", "|", "wc", "-l"], 
-            capture_output=True,
-            shell=True
-        )
-        stats["total_files"] = total_files.strip()
-    except:
-        pass
-    
+
+    stats["last_update"] = datetime.datetime.fromtimestamp(
+        mirror_stat.st_mtime
+    ).strftime("%Y-%m-%d %H:%M:%S")
+
+    total_size, file_count, _ = count_and_size(mirror_path)
+    stats["total_size"] = humanize_size(total_size)
+    stats["total_files"] = str(file_count)
+
     stats["status"] = "Available"
     return stats
 
@@ -125,7 +97,7 @@ def run_mirror_cleanup(paths: Dict[str, str]) -> bool:
     logging.info("Running apt-mirror cleanup")
     cleanup_script = "/var/spool/apt-mirror/var/clean.sh"
     
-    if not os.path.exists(cleanup_script):
+    if try_stat(cleanup_script) is None:
         logging.warning(f"Cleanup script not found: {cleanup_script}")
         return False
     
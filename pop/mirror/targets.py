@@ -0,0 +1,79 @@
+"""
+Shared contract traversal for mirror planning in Ubuntu Pro on Premises (PoP)
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List
+
+from pop.core.contracts import map_entitlement_to_repo_path
+
+
+@dataclass(frozen=True)
+class MirrorTarget:
+    """One (repository, suite, architecture) combination to mirror"""
+    apt_url: str
+    suite: str
+    arch: str
+    token: str
+    repo_path: str
+
+
+def iter_mirror_targets(contract_data: Dict[str, Any], resources: Dict[str, str],
+                        release: str, architectures: List[str],
+                        entitlements: List[str]) -> Iterator[MirrorTarget]:
+    """
+    Yield every mirror target selected by the contract and configuration
+
+    Centralizes the filtering rules (entitled entitlements only, URL
+    normalization, release/suite matching, token lookup) so consumers
+    like the size estimator walk the contract once and agree on what
+    is in scope.
+
+    Args:
+        contract_data: Contract data as returned by pull_contract_data
+        resources: Dictionary mapping entitlement types to resource tokens
+        release: Ubuntu release codename (e.g., 'jammy')
+        architectures: List of architectures to support
+        entitlements: List of entitlements to include
+
+    Yields:
+        MirrorTarget per (repository, suite, architecture) combination
+    """
+    for token, info in contract_data.items():
+        for entitlement in info.get("contractInfo", {}).get("resourceEntitlements", []):
+            ent_type = entitlement.get("type")
+            apt_url = entitlement.get("directives", {}).get("aptURL")
+            suites = entitlement.get("directives", {}).get("suites", [])
+            entitled = entitlement.get("entitled", False)
+
+            # Map the entitlement name (handles esm-infra -> infra conversion)
+            repo_path = map_entitlement_to_repo_path(ent_type)
+
+            # Skip if not entitled, missing URL, or not in our entitlements list
+            if not entitled or not apt_url or repo_path not in entitlements:
+                continue
+
+            # Get token for this entitlement
+            resource_token = resources.get(ent_type)
+            if not resource_token:
+                logging.warning(f"No token found for entitlement {ent_type}")
+                continue
+
+            # Ensure URL format
+            if repo_path == "anbox-cloud":
+                if not apt_url.endswith('/'):
+                    apt_url += "/"
+            else:
+                if not apt_url.endswith('/ubuntu/'):
+                    if apt_url.endswith('/'):
+                        apt_url += "ubuntu/"
+                    else:
+                        apt_url += "/ubuntu/"
+
+            # One target per matching suite and architecture
+            for suite in suites:
+                if release in suite:
+                    for arch in architectures:
+                        yield MirrorTarget(apt_url, suite, arch,
+                                           resource_token, repo_path)
@@ -1,3 +1,10 @@
 """
 Service management for Ubuntu Pro on Premises (PoP)
 """
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared pool for service-setup work. Spawning a thread per call is
+# cheap, but subprocess-heavy stages benefit from reusing one pool
+# instead of paying a pool spin-up per function.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
@@ -4,47 +4,105 @@ Cron job management for Ubuntu Pro on Premises (PoP)
 
 import os
 import logging
-import shutil
 import datetime
 from typing import Dict, Optional
 
-from pop.utils.system import run_command
+from pop.utils.statx import fast_stat
+from pop.utils.system import atomic_write, ensure_dir, fast_copy, run_command, try_stat
+
+
+def _cron_payload(content: str) -> str:
+    """
+    Strip comment lines from a cron file for change comparison
+
+    The generated header carries a creation timestamp, so raw contents
+    never compare equal; only the actual cron lines matter.
+
+    Args:
+        content: Full cron file text
+
+    Returns:
+        The non-comment lines joined with newlines
+    """
+    return "\n".join(line for line in content.splitlines()
+                     if line and not line.startswith("#"))
 
 
 def setup_cron_for_mirror(paths: Dict[str, str], schedule: str = "0 */12 * * *") -> bool:
     """
     Configure cron job for regular mirror updates
-    
+
+    The cron line rotates the log with savelog before each run (five
+    generations kept) so cron.log cannot grow without bound, and takes
+    a non-blocking flock so a mirror run that outlasts the schedule
+    interval is skipped rather than overlapped. A logrotate drop-in
+    covers systems where savelog is unavailable.
+
     Args:
         paths: Dictionary of system paths
         schedule: Cron schedule expression (default: every 12 hours)
-        
+
     Returns:
         True if successful, False otherwise
     """
     logging.info("Setting up cron job for mirror updates")
-    
+
+    cron_log = "/var/spool/apt-mirror/var/cron.log"
+    lock_file = "/var/spool/apt-mirror/var/pop.lock"
+
     try:
         # Create cron directory if needed
         cron_dir = os.path.dirname(paths["pop_cron_file"])
-        os.makedirs(cron_dir, exist_ok=True)
-        
+        ensure_dir(cron_dir)
+
         # Create cron job file
+        cron_command = (
+            f"/usr/bin/flock -n {lock_file} -c "
+            f"'/usr/bin/savelog -n -c 5 {cron_log} >/dev/null 2>&1; "
+            f"/usr/bin/apt-mirror >> {cron_log} 2>&1'"
+        )
         cron_content = f"""# PoP mirror update cron job
 # Created by PoP Configuration Script - {datetime.datetime.now().isoformat()}
-{schedule} apt-mirror /usr/bin/apt-mirror > /var/spool/apt-mirror/var/cron.log
+{schedule} apt-mirror {cron_command}
 """
-        
-        with open(paths["pop_cron_file"], 'w') as f:
-            f.write(cron_content)
-        
-        # Set proper permissions
-        os.chmod(paths["pop_cron_file"], 0o644)
-        
-        # Install cron job by copying to system cron.d directory
+
+        # Idempotent reconfigure: when both the staged file and the
+        # installed copy already carry this schedule, skip the writes
         system_cron_path = "/etc/cron.d/pop-mirror"
-        shutil.copy2(paths["pop_cron_file"], system_cron_path)
-        
+        payload = _cron_payload(cron_content)
+        try:
+            with open(paths["pop_cron_file"], 'r') as f:
+                staged = f.read()
+            with open(system_cron_path, 'r') as f:
+                installed = f.read()
+            if (_cron_payload(staged) == payload
+                    and _cron_payload(installed) == payload):
+                logging.info("Cron job already up to date")
+                return True
+        except OSError:
+            pass
+
+        atomic_write(paths["pop_cron_file"], cron_content.encode(), 0o644)
+
+        # Install cron job by copying to system cron.d directory
+        fast_copy(paths["pop_cron_file"], system_cron_path)
+
+        # Belt-and-braces rotation for systems without savelog
+        logrotate_content = f"""{cron_log} {{
+    rotate 5
+    size 50M
+    missingok
+    notifempty
+    compress
+    delaycompress
+}}
+"""
+        try:
+            with open("/etc/logrotate.d/pop-mirror", 'w') as f:
+                f.write(logrotate_content)
+        except OSError as e:
+            logging.warning(f"Could not install logrotate config: {e}")
+
         logging.info(f"Cron job set up with schedule: {schedule}")
         return True
     except Exception as e:
@@ -62,9 +120,9 @@ def verify_cron_job(paths: Dict[str, str]) -> bool:
     Returns:
         True if job is active, False otherwise
     """
-    # Check if our cron file exists
+    # Check if our cron file exists -- one stat
     system_cron_path = "/etc/cron.d/pop-mirror"
-    if not os.path.exists(system_cron_path):
+    if try_stat(system_cron_path) is None:
         logging.warning(f"Cron job not found: {system_cron_path}")
         return False
     
@@ -109,15 +167,14 @@ def get_last_run_time() -> Optional[str]:
         Timestamp of last run, or None if unable to determine
     """
     cron_log = "/var/spool/apt-mirror/var/cron.log"
-    
-    if not os.path.exists(cron_log):
-        return None
-        
+
     try:
-        # Get last modification time of log file
-        last_mod = os.path.getmtime(cron_log)
-        last_time = datetime.datetime.fromtimestamp(last_mod).isoformat()
-        return last_time
+        # One cached-metadata stat replaces the exists + getmtime pair
+        last_mod = fast_stat(cron_log).mtime
+    except OSError:
+        return None
     except Exception as e:
         logging.error(f"Failed to get last run time: {e}")
         return None
+
+    return datetime.datetime.fromtimestamp(last_mod).isoformat()
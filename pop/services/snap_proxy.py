@@ -2,36 +2,83 @@
 Snap proxy configuration for Ubuntu Pro on Premises (PoP)
 """
 
+import functools
 import os
 import logging
+import time
 from typing import Dict, Optional
 
-from pop.utils.system import run_command
+from pop.services import _EXECUTOR
+from pop.utils.system import ensure_dir, run_command
+
+
+def _ttl_cache(ttl: float):
+    """
+    Cache a zero-argument function's result for ttl seconds
+
+    Callers get a shallow copy so mutating the returned dictionary
+    cannot poison the cache. The wrapped function gains a cache_clear()
+    for tests and explicit invalidation.
+
+    Args:
+        ttl: Seconds the cached result stays valid
+
+    Returns:
+        Decorator applying the cache
+    """
+    def decorator(fn):
+        state = {}
+
+        @functools.wraps(fn)
+        def wrapper():
+            now = time.monotonic()
+            if state and now - state["at"] < ttl:
+                return dict(state["value"])
+            value = fn()
+            state["at"] = now
+            state["value"] = value
+            return dict(value)
+
+        wrapper.cache_clear = state.clear
+        return wrapper
+    return decorator
+
+
+def _init_snap_proxy(token: str) -> None:
+    """
+    Initialize the snap-proxy database and configure its token
+
+    The two snap-proxy commands are a true chain (config needs the
+    initialized database), but the pair is independent of the systemd
+    unit file write and can run alongside it.
+
+    Args:
+        token: Ubuntu Pro contract token
+    """
+    run_command(["snap-proxy", "init"])
+    run_command(["snap-proxy", "config", "account-token", token])
 
 
 def configure_snap_proxy(paths: Dict[str, str], token: str) -> bool:
     """
     Configure snap-proxy-server for offline use
-    
+
     Args:
         paths: Dictionary of system paths
         token: Ubuntu Pro contract token
-        
+
     Returns:
         True if successful, False otherwise
     """
     logging.info("Configuring snap-proxy-server for offline use")
-    
+
     try:
         # Create snap-proxy directory
-        os.makedirs(paths["pop_snap_proxy_dir"], exist_ok=True)
-        
-        # Initialize snap-proxy database
-        run_command(["snap-proxy", "init"])
-        
-        # Configure snap-proxy with token
-        run_command(["snap-proxy", "config", "account-token", token])
-        
+        ensure_dir(paths["pop_snap_proxy_dir"])
+
+        # Run the snap-proxy setup chain while the unit file is written
+        proxy_future = _EXECUTOR.submit(_init_snap_proxy, token)
+
         # Create a systemd service file for snap-proxy
         service_path = "/etc/systemd/system/snap-proxy.service"
         service_content = f"""[Unit]
@@ -49,12 +96,15 @@ WantedBy=multi-user.target
 """
         with open(service_path, 'w') as service_file:
             service_file.write(service_content)
-        
-        # Enable and start the service
+
+        # snap-proxy must be initialized before the service starts
+        proxy_future.result()
+
+        # enable --now folds the separate enable and start forks into
+        # one systemd round trip
         run_command(["systemctl", "daemon-reload"])
-        run_command(["systemctl", "enable", "snap-proxy"])
-        run_command(["systemctl", "start", "snap-proxy"])
-        
+        run_command(["systemctl", "enable", "--now", "snap-proxy"])
+
         logging.info("Snap proxy server configured successfully")
         return True
     except Exception as e:
@@ -62,10 +112,15 @@ WantedBy=multi-user.target
         return False
 
 
+@_ttl_cache(ttl=60)
 def check_snap_proxy_status() -> Dict[str, str]:
     """
     Check the status of snap proxy server
-    
+
+    The three probes run concurrently on the shared pool; snap info in
+    particular can touch the network and dominates the call, so the
+    whole result is TTL-cached for dashboard refreshes.
+
     Returns:
         Dictionary with status information
     """
@@ -75,37 +130,33 @@ def check_snap_proxy_status() -> Dict[str, str]:
         "port": "8000",
         "version": "Unknown"
     }
-    
+
     try:
-        # Check if service is running
-        status = run_command(
-            ["systemctl", "is-active", "snap-proxy"],
+        # All three probes are independent; fan them out
+        status_future = _EXECUTOR.submit(
+            run_command, ["systemctl", "is-active", "snap-proxy"],
             capture_output=True
         )
-        
-        if status.strip() == "active":
-            status_info["running"] = True
-        
-        # Check if service is enabled
-        enabled = run_command(
-            ["systemctl", "is-enabled", "snap-proxy"],
+        enabled_future = _EXECUTOR.submit(
+            run_command, ["systemctl", "is-enabled", "snap-proxy"],
             capture_output=True
         )
-        
-        if enabled.strip() == "enabled":
-            status_info["enabled"] = True
-        
-        # Get snap proxy version
-        version = run_command(
-            ["snap", "info", "snap-proxy-server"],
+        version_future = _EXECUTOR.submit(
+            run_command, ["snap", "info", "snap-proxy-server"],
             capture_output=True
         )
-        
-        for line in version.split("\n"):
-            if line.strip().startswith("installed:"):
-                status_info["version"] = line.split(":", 1)[1].strip()
-                break
-        
+
+        if status_future.result().strip() == "active":
+            status_info["running"] = True
+
+        if enabled_future.result().strip() == "enabled":
+            status_info["enabled"] = True
+
+        # One scan instead of splitting the whole output into lines
+        _, sep, rest = version_future.result().partition("installed:")
+        if sep:
+            status_info["version"] = rest.split("\n", 1)[0].strip()
+
         return status_info
     except Exception as e:
         logging.error(f"Failed to check snap proxy status: {e}")
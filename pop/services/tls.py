@@ -2,12 +2,62 @@
 TLS certificate configuration for Ubuntu Pro on Premises (PoP)
 """
 
+import datetime
 import os
 import logging
-import shutil
+import string
 from typing import Dict, Optional
 
-from pop.utils.system import run_command
+from pop.utils.system import atomic_write, ensure_dir, fast_copy, run_command, try_stat
+
+# cryptography parses and generates certificates fully in process (no
+# openssl forks, one PEM parse); it ships on Ubuntu as
+# python3-cryptography but is not a hard dependency, so fall back to
+# openssl subprocesses when it is absent
+# SSL-enabled nginx site, parsed once at import; substitution is one
+# O(n) pass and the literal braces need no f-string escaping
+_NGINX_TLS_TEMPLATE = string.Template("""server {
+    listen 80;
+    server_name _;
+
+    # Redirect HTTP to HTTPS
+    location / {
+        return 301 https://$$host$$request_uri;
+    }
+}
+
+server {
+    listen 443 ssl;
+    server_name _;
+
+    ssl_certificate $cert;
+    ssl_certificate_key $key;
+    ssl_protocols TLSv1.2 TLSv1.3;
+    ssl_ciphers HIGH:!aNULL:!MD5;
+    ssl_prefer_server_ciphers on;
+
+    root $www;
+    index index.html;
+
+    location / {
+        try_files $$uri $$uri/ =404;
+    }
+
+    # Serve apt-mirror content
+    location /mirror/ {
+        alias /var/spool/apt-mirror/mirror/;
+        autoindex on;
+    }
+}
+""")
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    _HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    _HAVE_CRYPTOGRAPHY = False
 
 
 def configure_tls_certificates(paths: Dict[str, str], tls_cert: str, tls_key: str) -> bool:
@@ -28,24 +78,24 @@ def configure_tls_certificates(paths: Dict[str, str], tls_cert: str, tls_key: st
     
     try:
         # Create TLS directory if needed
-        os.makedirs(paths["pop_tls_dir"], exist_ok=True)
+        ensure_dir(paths["pop_tls_dir"])
         
         # Copy certificates to the proper location
         cert_path = os.path.join(paths["pop_tls_dir"], "pop-cert.pem")
         key_path = os.path.join(paths["pop_tls_dir"], "pop-key.pem")
         
-        # Verify source files exist
-        if not os.path.exists(tls_cert):
+        # Verify source files exist -- one stat each
+        if try_stat(tls_cert) is None:
             logging.error(f"TLS certificate file not found: {tls_cert}")
             return False
-            
-        if not os.path.exists(tls_key):
+
+        if try_stat(tls_key) is None:
             logging.error(f"TLS key file not found: {tls_key}")
             return False
         
-        # Copy files
-        shutil.copy2(tls_cert, cert_path)
-        shutil.copy2(tls_key, key_path)
+        # Copy files without routing the bytes through userspace
+        fast_copy(tls_cert, cert_path)
+        fast_copy(tls_key, key_path)
         
         # Set appropriate permissions
         os.chmod(cert_path, 0o644)
@@ -54,62 +104,37 @@ def configure_tls_certificates(paths: Dict[str, str], tls_cert: str, tls_key: st
         # Update nginx configuration to use SSL
         nginx_conf_path = paths["pop_nginx_conf"]
         nginx_conf_dir = os.path.dirname(nginx_conf_path)
-        os.makedirs(nginx_conf_dir, exist_ok=True)
+        ensure_dir(nginx_conf_dir)
         
-        # Read existing conf if it exists
-        if os.path.exists(nginx_conf_path):
+        # Read existing conf if it exists; the stat doubles as the
+        # existence probe
+        if try_stat(nginx_conf_path) is not None:
             with open(nginx_conf_path, 'r') as f:
                 nginx_conf = f.read()
-            
+
             # Check if already configured for SSL
             if "ssl_certificate" in nginx_conf:
                 # Already configured
                 logging.info("Nginx already configured for SSL")
                 return True
         
-        # Create new SSL-enabled configuration
-        with open(nginx_conf_path, 'w') as f:
-            f.write(f"""server {{
-    listen 80;
-    server_name _;
-    
-    # Redirect HTTP to HTTPS
-    location / {{
-        return 301 https://$host$request_uri;
-    }}
-}}
+        # Create new SSL-enabled configuration; the temp-sibling plus
+        # rename means a reload sees either the old or the new config,
+        # never a half-written one
+        atomic_write(nginx_conf_path, _NGINX_TLS_TEMPLATE.substitute(
+            cert=cert_path, key=key_path, www=paths["pop_www_dir"]
+        ).encode(), 0o644)
 
-server {{
-    listen 443 ssl;
-    server_name _;
-    
-    ssl_certificate {cert_path};
-    ssl_certificate_key {key_path};
-    ssl_protocols TLSv1.2 TLSv1.3;
-    ssl_ciphers HIGH:!aNULL:!MD5;
-    ssl_prefer_server_ciphers on;
-    
-    root {paths["pop_www_dir"]};
-    index index.html;
-    
-    location / {{
-        try_files $uri $uri/ =404;
-    }}
-    
-    # Serve apt-mirror content
-    location /mirror/ {{
-        alias /var/spool/apt-mirror/mirror/;
-        autoindex on;
-    }}
-}}
-""")
-        
-        # Create symlink to enable the site
+        # Enable the site; building the symlink aside and renaming it
+        # over the old one replaces the unlink+symlink pair atomically
         nginx_sites_enabled = "/etc/nginx/sites-enabled/pop"
-        if os.path.exists(nginx_sites_enabled):
-            os.unlink(nginx_sites_enabled)
-        
-        os.symlink(nginx_conf_path, nginx_sites_enabled)
+        tmp_link = f"{nginx_sites_enabled}.new"
+        try:
+            os.unlink(tmp_link)
+        except OSError:
+            pass
+        os.symlink(nginx_conf_path, tmp_link)
+        os.replace(tmp_link, nginx_sites_enabled)
         
         # Reload nginx
         run_command(["systemctl", "reload", "nginx"])
@@ -139,44 +164,46 @@ def verify_tls_certificates(paths: Dict[str, str]) -> Dict[str, str]:
         "subject": "Unknown"
     }
     
-    # Check if certificates exist
+    # Check if certificates exist -- one stat per path
     cert_path = os.path.join(paths["pop_tls_dir"], "pop-cert.pem")
     key_path = os.path.join(paths["pop_tls_dir"], "pop-key.pem")
-    
-    if not os.path.exists(cert_path) or not os.path.exists(key_path):
+
+    if try_stat(cert_path) is None or try_stat(key_path) is None:
         return cert_info
     
     cert_info["installed"] = True
     cert_info["cert_path"] = cert_path
-    
-    # Get certificate details with openssl
+
+    # Parse the certificate once in process; without cryptography, one
+    # openssl fork pulls all three fields instead of three forks
     try:
-        # Get expiration
-        expires = run_command(
-            ["openssl", "x509", "-in", cert_path, "-enddate", "-noout"],
-            capture_output=True
-        )
-        if expires:
-            cert_info["expires"] = expires.replace("notAfter=", "").strip()
-        
-        # Get issuer
-        issuer = run_command(
-            ["openssl", "x509", "-in", cert_path, "-issuer", "-noout"],
-            capture_output=True
-        )
-        if issuer:
-            cert_info["issuer"] = issuer.replace("issuer=", "").strip()
-        
-        # Get subject
-        subject = run_command(
-            ["openssl", "x509", "-in", cert_path, "-subject", "-noout"],
-            capture_output=True
-        )
-        if subject:
-            cert_info["subject"] = subject.replace("subject=", "").strip()
+        if _HAVE_CRYPTOGRAPHY:
+            with open(cert_path, 'rb') as f:
+                cert = x509.load_pem_x509_certificate(f.read())
+            try:
+                expires = cert.not_valid_after_utc
+            except AttributeError:
+                # cryptography < 42 has no _utc accessor
+                expires = cert.not_valid_after
+            cert_info["expires"] = expires.isoformat()
+            cert_info["issuer"] = cert.issuer.rfc4514_string()
+            cert_info["subject"] = cert.subject.rfc4514_string()
+        else:
+            output = run_command(
+                ["openssl", "x509", "-in", cert_path,
+                 "-enddate", "-issuer", "-subject", "-noout"],
+                capture_output=True
+            )
+            for line in output.splitlines():
+                if line.startswith("notAfter="):
+                    cert_info["expires"] = line[len("notAfter="):].strip()
+                elif line.startswith("issuer="):
+                    cert_info["issuer"] = line[len("issuer="):].strip()
+                elif line.startswith("subject="):
+                    cert_info["subject"] = line[len("subject="):].strip()
     except Exception as e:
         logging.error(f"Failed to get TLS certificate details: {e}")
-    
+
     return cert_info
 
 
@@ -198,33 +225,59 @@ def generate_self_signed_certificate(paths: Dict[str, str], common_name: Optiona
         common_name = socket.gethostname()
     
     # Ensure TLS directory exists
-    os.makedirs(paths["pop_tls_dir"], exist_ok=True)
+    ensure_dir(paths["pop_tls_dir"])
     
     # Certificate paths
     cert_path = os.path.join(paths["pop_tls_dir"], "pop-cert.pem")
     key_path = os.path.join(paths["pop_tls_dir"], "pop-key.pem")
     
     try:
-        # Generate private key
-        run_command([
-            "openssl", "genrsa", 
-            "-out", key_path, 
-            "2048"
-        ])
-        
-        # Set proper permissions on private key
-        os.chmod(key_path, 0o600)
-        
-        # Generate certificate
-        run_command([
-            "openssl", "req", 
-            "-new", "-x509", 
-            "-key", key_path, 
-            "-out", cert_path, 
-            "-days", "3650",
-            "-subj", f"/CN={common_name}"
-        ])
-        
+        if _HAVE_CRYPTOGRAPHY:
+            # Fully in-process generation: no openssl forks, and the
+            # key goes to disk atomically with its final 0600 mode
+            key = rsa.generate_private_key(public_exponent=65537,
+                                           key_size=2048)
+            atomic_write(key_path, key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption()
+            ), 0o600)
+
+            name = x509.Name([
+                x509.NameAttribute(x509.oid.NameOID.COMMON_NAME, common_name)
+            ])
+            now = datetime.datetime.utcnow()
+            cert = (x509.CertificateBuilder()
+                    .subject_name(name)
+                    .issuer_name(name)
+                    .public_key(key.public_key())
+                    .serial_number(x509.random_serial_number())
+                    .not_valid_before(now)
+                    .not_valid_after(now + datetime.timedelta(days=3650))
+                    .sign(key, hashes.SHA256()))
+            atomic_write(cert_path,
+                         cert.public_bytes(serialization.Encoding.PEM), 0o644)
+        else:
+            # Generate private key
+            run_command([
+                "openssl", "genrsa",
+                "-out", key_path,
+                "2048"
+            ])
+
+            # Set proper permissions on private key
+            os.chmod(key_path, 0o600)
+
+            # Generate certificate
+            run_command([
+                "openssl", "req",
+                "-new", "-x509",
+                "-key", key_path,
+                "-out", cert_path,
+                "-days", "3650",
+                "-subj", f"/CN={common_name}"
+            ])
+
         logging.info(f"Generated self-signed certificate for {common_name}")
         return True
     except Exception as e:
@@ -6,46 +6,65 @@
 Logging configuration for Ubuntu Pro on Premises (PoP)
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from typing import Optional
 
 
 def setup_logging(verbose: bool = False, log_file: Optional[str] = None) -> None:
     """
     Configure logging for the PoP application.
-    
+
+    The file handler sits behind a QueueHandler/QueueListener pair, so
+    callers only enqueue records and a background thread does the
+    blocking write; chatty paths (every run_command logs) no longer pay
+    file I/O on the foreground thread. The listener is drained at exit
+    so no records are lost.
+
     Args:
         verbose: Enable debug logging if True
         log_file: Path to log file (optional)
-        
+
     Returns:
         None
     """
     # Set up log level based on verbosity
     log_level = logging.DEBUG if verbose else logging.INFO
-    
+
     # Configure basic logging to console
     console_format = '[%(levelname)s] %(message)s'
     logging.basicConfig(level=log_level, format=console_format)
-    
+
     # If log file is provided, add file handler
     if log_file:
         # Create directory if it doesn't exist
         log_dir = os.path.dirname(log_file)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
-            
-        # Create file handler
-        file_handler = logging.FileHandler(log_file)
+
+        # Create file handler; delay=True defers the open() until the
+        # first record actually arrives
+        file_handler = logging.FileHandler(log_file, delay=True)
         file_format = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
         file_formatter = logging.Formatter(file_format)
         file_handler.setFormatter(file_formatter)
-        
+
+        # Records are enqueued by callers and written by the listener
+        # thread, keeping write() latency off the hot path
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(
+            log_queue, file_handler, respect_handler_level=True
+        )
+        listener.start()
+        atexit.register(listener.stop)
+
         # Add handler to root logger
         root_logger = logging.getLogger()
-        root_logger.addHandler(file_handler)
-        
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
         logging.debug(f"Logging configured. Log file: {log_file}")
     else:
         logging.debug("Logging configured for console output only")
@@ -6,6 +6,7 @@ import os
 import logging
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
 from pop.utils.system import run_command
@@ -14,40 +15,55 @@ from pop.utils.system import run_command
 def install_prerequisites(offline_repo: str = "ppa:yellow/ua-airgapped") -> None:
     """
     Install required packages for PoP
-    
+
+    The PPA is added with --no-update before the single apt-get update,
+    so the cache refresh runs once instead of twice (add-apt-repository
+    -u used to trigger its own). The two snap installs are independent
+    of each other and of apt, so they run on a small pool alongside the
+    apt install.
+
     Args:
         offline_repo: PPA for air-gapped Pro packages
-        
+
     Returns:
         None
-        
+
     Raises:
         SystemExit: If installation fails
     """
     prereqs = "wget wget2 curl vim gawk apt-mirror apache2 nginx nginx-extras jq postgresql postgresql-contrib"
-    
+
     logging.info(f"Installing prerequisites: {prereqs}")
-    
+
     try:
-        # Update package lists
-        run_command(["apt-get", "update"])
-        
-        # Install prerequisites
+        # Add PPA for air-gapped packages first, without refreshing the
+        # cache; the single update below covers it
         run_command(
-            ["apt-get", "install", "-yqf", "--reinstall"] + prereqs.split()
+            ["add-apt-repository", "-y", "--no-update", offline_repo]
         )
-        
-        # Install yq via snap
-        run_command(["snap", "install", "yq", "--stable"])
-        
-        # Install snap-proxy-server
-        run_command(["snap", "install", "snap-proxy-server"])
-        
-        # Add PPA for air-gapped packages
-        run_command(
-            ["add-apt-repository", "-y", "-u", offline_repo]
-        )
-        
+
+        # One update picks up the PPA and the standard archives together
+        run_command(["apt-get", "update"])
+
+        # The snap installs share nothing with apt; overlap them with
+        # the prerequisite install (snap serializes its own state
+        # changes, so the two submissions queue internally at worst)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            yq_future = executor.submit(
+                run_command, ["snap", "install", "yq", "--stable"]
+            )
+            proxy_future = executor.submit(
+                run_command, ["snap", "install", "snap-proxy-server"]
+            )
+
+            # Install prerequisites in one apt transaction
+            run_command(
+                ["apt-get", "install", "-yqf", "--reinstall"] + prereqs.split()
+            )
+
+            yq_future.result()
+            proxy_future.result()
+
         logging.info("Prerequisites installed successfully")
     except Exception as e:
         logging.error(f"Failed to install prerequisites: {e}")
@@ -0,0 +1,169 @@
+"""
+statx(2) fast path for metadata queries in Ubuntu Pro on Premises (PoP)
+
+os.stat fills the full stat struct and, on network filesystems, can
+force the server to flush metadata before answering. statx lets the
+caller request only the fields the mirror code actually reads (type,
+size, mtime) and pass AT_STATX_DONT_SYNC so warm queries are served
+from the kernel cache. Kernels without statx (< 4.11), non-Linux
+platforms, and unknown architectures all fall back to os.stat; the
+availability probe runs once per process.
+"""
+
+import ctypes
+import functools
+import os
+import platform
+import stat as stat_module
+import struct
+from typing import NamedTuple
+
+# statx syscall numbers per architecture; anything absent here uses the
+# os.stat fallback
+_SYS_STATX = {
+    "x86_64": 332,
+    "aarch64": 291,
+    "riscv64": 291,
+    "s390x": 379,
+    "ppc64le": 383,
+}.get(platform.machine())
+
+# Constants from fcntl.h / stat.h
+_AT_FDCWD = -100
+_AT_SYMLINK_NOFOLLOW = 0x100
+_AT_STATX_DONT_SYNC = 0x4000
+_STATX_TYPE = 0x0001
+_STATX_MTIME = 0x0040
+_STATX_SIZE = 0x0200
+_STATX_MASK = _STATX_TYPE | _STATX_SIZE | _STATX_MTIME
+
+# struct statx is 256 bytes; the fields we read sit at fixed offsets:
+# u16 stx_mode at 28, u64 stx_size at 40, statx_timestamp stx_mtime
+# (s64 sec, u32 nsec) at 112
+_BUFFER_SIZE = 256
+_MODE_OFFSET = 28
+_SIZE_OFFSET = 40
+_MTIME_OFFSET = 112
+
+_libc = None
+if _SYS_STATX is not None and os.name == "posix":
+    try:
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.syscall.restype = ctypes.c_long
+    except OSError:
+        _libc = None
+
+
+class FastStat(NamedTuple):
+    """The three metadata fields the mirror code reads"""
+    size: int
+    mtime: float
+    is_dir: bool
+
+
+def _statx(dirfd: int, path: bytes, flags: int) -> FastStat:
+    """
+    Issue one statx call and unpack the requested fields
+
+    Args:
+        dirfd: Directory fd for relative lookups, or AT_FDCWD
+        path: Path to stat, relative to dirfd
+        flags: AT_* flags (DONT_SYNC is always added)
+
+    Returns:
+        FastStat for the path
+
+    Raises:
+        OSError: If the syscall fails (including ENOSYS)
+    """
+    buf = ctypes.create_string_buffer(_BUFFER_SIZE)
+    ret = _libc.syscall(
+        ctypes.c_long(_SYS_STATX), ctypes.c_int(dirfd), ctypes.c_char_p(path),
+        ctypes.c_int(flags | _AT_STATX_DONT_SYNC), ctypes.c_uint(_STATX_MASK),
+        buf
+    )
+    if ret != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), os.fsdecode(path))
+
+    # Native byte order: the struct comes from the local kernel, so
+    # "=" is correct on big-endian s390x as well as little-endian hosts
+    mode = struct.unpack_from("=H", buf, _MODE_OFFSET)[0]
+    size = struct.unpack_from("=Q", buf, _SIZE_OFFSET)[0]
+    sec, nsec = struct.unpack_from("=qI", buf, _MTIME_OFFSET)
+    return FastStat(size, sec + nsec / 1e9, stat_module.S_ISDIR(mode))
+
+
+@functools.lru_cache(maxsize=1)
+def _statx_available() -> bool:
+    """
+    Probe once whether statx works on this kernel
+
+    Returns:
+        True if the syscall exists and answers for /
+    """
+    if _libc is None:
+        return False
+    try:
+        _statx(_AT_FDCWD, b"/", 0)
+        return True
+    except OSError:
+        return False
+
+
+def _os_fast_stat(path, dir_fd=None, follow_symlinks=True) -> FastStat:
+    """
+    os.stat fallback shaped like the statx result
+
+    Args:
+        path: Path to stat
+        dir_fd: Directory fd for relative lookups
+        follow_symlinks: Whether to resolve a trailing symlink
+
+    Returns:
+        FastStat for the path
+    """
+    st = os.stat(path, dir_fd=dir_fd, follow_symlinks=follow_symlinks)
+    return FastStat(st.st_size, st.st_mtime, stat_module.S_ISDIR(st.st_mode))
+
+
+def fast_stat(path) -> FastStat:
+    """
+    Stat a path requesting only type, size, and mtime
+
+    Args:
+        path: Path to stat
+
+    Returns:
+        FastStat for the path
+
+    Raises:
+        OSError: If the path cannot be statted
+    """
+    if _statx_available():
+        return _statx(_AT_FDCWD, os.fsencode(path), 0)
+    return _os_fast_stat(path)
+
+
+def fast_stat_at(dirfd: int, name, follow_symlinks: bool = False) -> FastStat:
+    """
+    Stat a name relative to an open directory fd
+
+    Used by the getdents64 walker, where every entry is statted
+    relative to the directory already open.
+
+    Args:
+        dirfd: Open directory file descriptor
+        name: Entry name within that directory
+        follow_symlinks: Whether to resolve a trailing symlink
+
+    Returns:
+        FastStat for the entry
+
+    Raises:
+        OSError: If the entry cannot be statted
+    """
+    if _statx_available():
+        flags = 0 if follow_symlinks else _AT_SYMLINK_NOFOLLOW
+        return _statx(dirfd, os.fsencode(name), flags)
+    return _os_fast_stat(name, dir_fd=dirfd, follow_symlinks=follow_symlinks)
@@ -5,6 +5,7 @@ Apache configuration for Ubuntu Pro on Premises (PoP)
 import os
 import logging
 import shutil
+import stat
 from typing import Dict, Optional
 
 from pop.utils.system import run_command
@@ -48,19 +49,29 @@ def setup_apache_for_mirror(paths: Dict[str, str], mirror_host: str) -> bool:
             full_mirror_path = os.path.join(mirror_path, repo_path)
             www_link_path = f"/var/www/html/{link_name}"
             
-            # Check if the source directory exists before creating the symlink
-            if os.path.exists(full_mirror_path):
-                # Remove existing link if it exists
-                if os.path.exists(www_link_path):
-                    if os.path.islink(www_link_path):
-                        os.unlink(www_link_path)
-                    else:
-                        # It's a directory, remove it
-                        shutil.rmtree(www_link_path)
-                
-                # Create the symlink
-                os.symlink(full_mirror_path, www_link_path)
-                logging.info(f"Created symlink: {www_link_path} -> {full_mirror_path}")
+            # One lstat each for the source and the link replaces the
+            # exists/islink probe pairs; branch on the returned mode
+            try:
+                os.lstat(full_mirror_path)
+            except FileNotFoundError:
+                # Repository not mirrored (yet); nothing to link
+                continue
+
+            try:
+                lst = os.lstat(www_link_path)
+            except FileNotFoundError:
+                lst = None
+
+            if lst is not None:
+                if stat.S_ISDIR(lst.st_mode):
+                    # A real directory is squatting on the link path
+                    shutil.rmtree(www_link_path)
+                else:
+                    os.unlink(www_link_path)
+
+            # Create the symlink
+            os.symlink(full_mirror_path, www_link_path)
+            logging.info(f"Created symlink: {www_link_path} -> {full_mirror_path}")
         
         # Create Apache configuration
         apache_conf = f"""<VirtualHost *:80>
@@ -8,7 +8,7 @@ import datetime
 import subprocess
 from typing import Dict, List, Any, Optional
 
-from pop.core.contracts import extract_account_info, extract_entitlements
+from pop.core.contracts import parse_contract
 from pop.mirror.sync import verify_mirror
 
 
@@ -37,9 +37,10 @@ def generate_web_ui(paths: Dict[str, str], resources: Dict[str, str],
         os.makedirs(f"{www_dir}/css", exist_ok=True)
         os.makedirs(f"{www_dir}/js", exist_ok=True)
         
-        # Get contract info
-        account_info = extract_account_info(contract_data)
-        entitlements = extract_entitlements(contract_data)
+        # Get contract info in one traversal
+        parsed = parse_contract(contract_data)
+        account_info = parsed.account
+        entitlements = parsed.entitlements
         
         # Get mirror stats
         mirror_stats = get_mirror_stats(paths, release, architectures)
@@ -13,6 +13,9 @@ setup(
     url="https://github.com/ThinGuy/pop",
     packages=find_packages(),
     include_package_data=True,
+    package_data={
+        "pop.data.keys": ["*.gpg"],
+    },
     install_requires=[
         "requests",
         "pyyaml",